@@ -40,13 +40,19 @@ https://gitorious.org/pyosc/devel/source/6aaf78b0c1e89942a9c5b1952266791b7ae1601
 
 String are latin-1 encoded and decoded.
 Use decodeOSC(data) to convert a binary OSC message data to a Python list.
+Use walkOSC(data) to decode the messages of a bundle one by one.
 Use OSCMessage() and OSCBundle() to create OSC message.
 
 '''
 
+import sys
 import math
+import time
+import array
 import struct
 import binascii
+import functools
+import itertools
 
 global FloatTypes
 FloatTypes = [float]
@@ -54,6 +60,23 @@ FloatTypes = [float]
 global IntTypes
 IntTypes = [int]
 
+global BoolTypes
+BoolTypes = [bool]
+
+# Arguments appended without checking if they are lists, dicts or arrays
+_scalarTypes = (float, int, str)
+
+# Optional: numpy arrays of numbers are encoded in one call, and decodeOSC()
+# can return runs of numbers as numpy arrays
+try:
+    import numpy
+    FloatTypes.extend([numpy.float16, numpy.float32, numpy.float64])
+    IntTypes.extend([numpy.int8, numpy.int16, numpy.int32, numpy.int64,
+                     numpy.uint8, numpy.uint16, numpy.uint32, numpy.uint64])
+    BoolTypes.append(numpy.bool_)
+except ImportError:
+    numpy = None
+
 global NTP_epoch
 from calendar import timegm
 NTP_epoch = timegm((1900,1,1,0,0,0)) # NTP time started in 1 Jan 1900
@@ -113,14 +136,28 @@ class OSCMessage(object):
 
     Additional methods exist for retreiving typetags or manipulating items as
     (typetag, value) tuples.
+
+    Arguments are kept as a list of (typetag, value, binary) tuples, so
+    list-style reads and edits only touch the concerned arguments, without
+    decoding or re-encoding the whole message. The value is None until it is
+    read: it is then decoded from the binary, as the receiver will decode it.
+    getBinary() joins the binaries only once, and caches the result until
+    the next change of the address or of the arguments.
+    A numpy array is kept as one tuple for all its elements, see OSCArray(),
+    split in one tuple per element only when the arguments are read or
+    edited one by one.
     """
     def __init__(self, address="", *args):
         """Instantiate a new OSCMessage.
         The OSC-address can be specified with the 'address' argument.
         The rest of the arguments are appended as data.
         """
-        self.clear(address)
-        if len(args)>0:
+        # As clear(address), without the property calls
+        self._address = address
+        self._args = []
+        self._packed = False
+        self._binary = None
+        if args:
             self.append(*args)
 
     def setAddress(self, address):
@@ -137,27 +174,73 @@ class OSCMessage(object):
 
     def clearData(self):
         """Clear any arguments appended so far"""
-        self.typetags = ","
-        self.message  = b""
-
-    def append(self, argument, typehint=None):
-        """Appends data to the message, updating the typetags based on
-        the argument's type. If the argument is a blob (counted
-        string) pass in 'b' as typehint.
-        'argument' may also be a list or tuple, in which case its elements
-        will get appended one-by-one, all using the provided typehint
+        self._args = []
+        self._packed = False
+        self._binary = None
+
+    @property
+    def address(self):
+        """The OSC-address of the message"""
+        return self._address
+
+    @address.setter
+    def address(self, address):
+        self._address = address
+        self._binary = None
+
+    @property
+    def typetags(self):
+        """The typetag-string of the message, starting with ','"""
+        return "," + "".join([arg[0] for arg in self._args])
+
+    @property
+    def message(self):
+        """The encoded arguments of the message"""
+        return b"".join([arg[2] for arg in self._args])
+
+    def _encode(self, argument, typehint=None, args=None):
+        """Returns the list of (typetag, value, binary) tuples describing
+        'argument', as it would be appended to the message.
+        'value' is None, the argument is decoded from 'binary' only when
+        read, see _argumentValue(). Lists encoded as OSC arrays keep the
+        list of their decoded elements. A numpy array gives one tuple for
+        all its elements, see OSCArray().
+        The tuples are appended to 'args' if given.
         """
+        if args is None:
+            args = []
+
+        if not typehint and type(argument) in _scalarTypes:
+            # Most frequent case: a number or a string, encoded at once
+            tag, binary = OSCArgument(argument)
+            args.append((tag, None, binary))
+            return args
+        elif typehint:
+            if isinstance(typehint, str) and typehint.startswith('['):
+                args.append(self._encodeList(argument, typehint))
+                return args
+            elif typehint in ('r', 'm') and isinstance(argument,
+                                                       (list, tuple)):
+                tag, binary = OSCArgument(argument, typehint)
+                args.append((tag, None, binary))
+                return args
 
         if isinstance(argument,dict):
             argument = list(argument.items())
         elif isinstance(argument, OSCMessage):
             raise TypeError("Can only append 'OSCMessage' to 'OSCBundle'")
+        elif numpy is not None and isinstance(argument, numpy.ndarray):
+            encoded = OSCArray(argument, typehint)
+            if encoded is not None:
+                args.extend(encoded)
+                self._packed = True
+                return args
 
         if hasattr(argument, '__iter__') and not type(argument) in (str,bytes):
             for arg in argument:
-                self.append(arg, typehint)
+                self._encode(arg, typehint, args)
 
-            return
+            return args
 
         if typehint == 'b':
             binary = OSCBlob(argument)
@@ -168,17 +251,69 @@ class OSCMessage(object):
         else:
             tag, binary = OSCArgument(argument, typehint)
 
-        self.typetags += tag
-        self.message += binary
+        args.append((tag, None, binary))
+        return args
+
+    def _encodeList(self, argument, typehint='['):
+        """Returns the (typetag, value, binary) tuple of 'argument', a list
+        encoded as one OSC array: its typetag is '[' followed by the
+        typetags of the elements and ']'.
+        'typehint' is '[', or '[' followed by a typehint for each element
+        and ']'. Without typehint, lists and tuples in 'argument' are
+        encoded as nested OSC arrays.
+        """
+        hints = _splitTypetags(typehint[1:-1])
+        tags, values, binaries = [], [], []
+        for i, item in enumerate(argument):
+            hint = hints[i] if i < len(hints) else None
+            if hint is None and isinstance(item, (list, tuple)):
+                hint = '['
+            for arg in _expandArgs(self._encode(item, hint)):
+                tags.append(arg[0])
+                values.append(_argumentValue(arg))
+                binaries.append(arg[2])
+
+        return ("[" + "".join(tags) + "]", values, b"".join(binaries))
+
+    def _encodeItems(self, items):
+        """Returns the list of (typetag, value, binary) tuples describing
+        the given list of (typehint, value) tuples.
+        """
+        args = []
+        for item in items:
+            self._encode(item[1], item[0], args)
+
+        return args
+
+    def append(self, argument, typehint=None):
+        """Appends data to the message, updating the typetags based on
+        the argument's type. If the argument is a blob (counted
+        string) pass in 'b' as typehint.
+        'argument' may also be a list or tuple, in which case its elements
+        will get appended one-by-one, all using the provided typehint
+        """
+        self._encode(argument, typehint, self._args)
+        self._binary = None
+
+    def _unpack(self):
+        """Splits the numpy arrays appended in one argument per element,
+        before the arguments are read or edited one by one.
+        """
+        if self._packed:
+            self._args = _expandArgs(self._args)
+            self._packed = False
 
     def getBinary(self):
         """Returns the binary representation of the message
         """
-        binary = OSCString(self.address)
-        binary += OSCString(self.typetags)
-        binary += self.message
+        if self._binary is None:
+            args = self._args
+            typetags = "," + "".join([arg[0] for arg in args])
+            self._binary = b"".join([OSCString(self._address),
+                                     OSCString(typetags)] +
+                                    [arg[2] for arg in args])
 
-        return binary
+        return self._binary
 
     def __repr__(self):
         """Returns a string containing the decode Message
@@ -193,7 +328,8 @@ class OSCMessage(object):
     def __len__(self):
         """Returns the number of arguments appended so far.
         """
-        return (len(self.typetags) - 1)
+        self._unpack()
+        return len(self._args)
 
     def __eq__(self, other):
         """Return True if two OSCMessages have the same address & content
@@ -238,33 +374,21 @@ class OSCMessage(object):
 
         return out
 
-    def _reencode(self, items):
-        """Erase & rebuild the OSCMessage contents from the given
-        list of (typehint, value) tuples.
-        """
-        self.clearData()
-        for item in items:
-            self.append(item[1], item[0])
-
     def values(self):
         """Returns a list of the arguments appended so far."""
-        return decodeOSC(self.getBinary())[2:]
+        self._unpack()
+        return [_argumentValue(arg) for arg in self._args]
 
     def tags(self):
         """Returns a list of typetags of the appended arguments."""
-        return list(self.typetags.lstrip(','))
+        self._unpack()
+        return [arg[0] for arg in self._args]
 
     def items(self):
         """Returns a list of (typetag, value) tuples for
         the arguments appended so far
         """
-        out = []
-        values = list(self.values())
-        typetags = self.tags()
-        for i in range(len(values)):
-            out.append((typetags[i], values[i]))
-
-        return out
+        return list(zip(self.tags(), self.values()))
 
     def __contains__(self, val):
         """Test if the given value appears in the OSCMessage's arguments."""
@@ -273,14 +397,17 @@ class OSCMessage(object):
 
     def __getitem__(self, i):
         """Returns the indicated argument (or slice)."""
-        return list(self.values())[i]
+        self._unpack()
+        if isinstance(i,slice):
+            return [_argumentValue(arg) for arg in self._args[i]]
+
+        return _argumentValue(self._args[i])
 
     def __delitem__(self, i):
         """Removes the indicated argument (or slice)."""
-        items = list(self.items())
-        del items[i]
-
-        self._reencode(items)
+        self._unpack()
+        del self._args[i]
+        self._binary = None
 
     def _buildItemList(self, values, typehint=None):
         if isinstance(values, OSCMessage):
@@ -299,40 +426,44 @@ class OSCMessage(object):
 
         return items
 
+    def _replace(self, i, items):
+        """Replace the indicated argument with the given list of
+        (typehint, value) tuples.
+        """
+        self._unpack()
+        i = range(len(self._args))[i]
+        self._args[i:i+1] = self._encodeItems(items)
+        self._binary = None
+
     def __setitem__(self, i, val):
         """Set indicatated argument (or slice) to a new value.
         'val' can be a single int/float/string, or a (typehint, value) tuple.
         Or, if 'i' is a slice, a list of these or another OSCMessage.
         """
-        items = list(self.items())
-
         new_items = self._buildItemList(val)
 
-        if not isinstance(i,slice):
-            if len(new_items) != 1:
-                raise TypeError("single-item assignment expects a single value\
-                or a (typetag, value) tuple")
-
-            new_items = new_items[0]
+        if isinstance(i,slice):
+            self._unpack()
+            self._args[i] = self._encodeItems(new_items)
+            self._binary = None
+            return
 
-        # finally...
-        items[i] = new_items
+        if len(new_items) != 1:
+            raise TypeError("single-item assignment expects a single value\
+            or a (typetag, value) tuple")
 
-        self._reencode(items)
+        self._replace(i, new_items)
 
     def setItem(self, i, val, typehint=None):
         """Set indicated argument to a new value (with typehint)."""
-        items = list(self.items())
-
-        items[i] = (typehint, val)
-
-        self._reencode(items)
+        self._replace(i, [(typehint, val)])
 
     def copy(self):
         """Returns a deep copy of this OSCMessage."""
         msg = self.__class__(self.address)
-        msg.typetags = self.typetags
-        msg.message = self.message
+        msg._args = list(self._args)
+        msg._packed = self._packed
+        msg._binary = self._binary
         return msg
 
     def count(self, val):
@@ -352,32 +483,26 @@ class OSCMessage(object):
         'values' can be another OSCMessage,
         or a list/tuple of ints/floats/strings
         """
-        items = list(self.items()) + self._buildItemList(values)
-
-        self._reencode(items)
+        self._args.extend(self._encodeItems(self._buildItemList(values)))
+        self._binary = None
 
     def insert(self, i, val, typehint = None):
         """Insert given value (with optional typehint) into the OSCMessage
         at the given index.
         """
-        items = list(self.items())
-
-        for item in reversed(self._buildItemList(val)):
-            items.insert(i, item)
-
-        self._reencode(items)
+        self._unpack()
+        self._args[i:i] = self._encodeItems(self._buildItemList(val, typehint))
+        self._binary = None
 
     def popitem(self, i):
         """Delete the indicated argument from the OSCMessage, and return it
         as a (typetag, value) tuple.
         """
-        items = list(self.items())
-
-        item = items.pop(i)
-
-        self._reencode(items)
+        item = self[i]
+        tag = self._args[i][0]
+        del self[i]
 
-        return item
+        return (tag, item)
 
     def pop(self, i):
         """Delete the indicated argument from the OSCMessage, and return it.
@@ -387,32 +512,21 @@ class OSCMessage(object):
 
     def reverse(self):
         """Reverses the arguments of the OSCMessage (in place)."""
-        items = list(self.items())
-
-        items.reverse()
-
-        self._reencode(items)
+        self._unpack()
+        self._args.reverse()
+        self._binary = None
 
     def remove(self, val):
         """Removes the first argument with the given value from the OSCMessage.
         Raises ValueError if val isn't found."""
-        items = list(self.items())
-
-        # this is not very efficient...
-        i = 0
-        for (t, v) in items:
-            if (v == val):
+        self._unpack()
+        for i, arg in enumerate(self._args):
+            if (_argumentValue(arg) == val):
                 break
-            i += 1
         else:
-            raise ValueError("'%s' not in OSCMessage" % str(m))
-        # but more efficient than first calling self.values().index(val),
-        # then calling self.items(),
-        # which would in turn call self.values() again...
+            raise ValueError("'%s' not in OSCMessage" % str(val))
 
-        del items[i]
-
-        self._reencode(items)
+        del self[i]
 
     def __iter__(self):
         """Returns an iterator of the OSCMessage's arguments."""
@@ -464,6 +578,16 @@ class OSCBundle(OSCMessage):
         super(OSCBundle, self).__init__(address)
         self.timetag = time
 
+    @property
+    def timetag(self):
+        """The timetag of the bundle, in floating seconds since the Epoch"""
+        return self._timetag
+
+    @timetag.setter
+    def timetag(self, time):
+        self._timetag = time
+        self._binary = None
+
     def __str__(self):
         """Returns the Bundle's contents (and timetag, if nonzero) as a string.
         """
@@ -510,7 +634,7 @@ class OSCBundle(OSCMessage):
             arguments
         """
         if isinstance(argument, OSCMessage):
-            binary = OSCBlob(argument.getBinary())
+            msg = argument.copy()
         else:
             msg = OSCMessage(self.address)
             if isinstance(argument,dict):
@@ -521,42 +645,39 @@ class OSCBundle(OSCMessage):
             else:
                 msg.append(argument, typehint)
 
-            binary = OSCBlob(msg.getBinary())
-
-        self.message += binary
-        self.typetags += 'b'
+        self._args.append(('b', msg, OSCBlob(msg.getBinary())))
+        self._binary = None
 
     def getBinary(self):
         """Returns the binary representation of the message
         """
-        binary = OSCString("#bundle")
-        binary += OSCTimeTag(self.timetag)
-        binary += self.message
-
-        return binary
+        if self._binary is None:
+            binary = [OSCString("#bundle"), OSCTimeTag(self._timetag)]
+            binary.extend([arg[2] for arg in self._args])
+            self._binary = b"".join(binary)
 
-    def _reencapsulate(self, decoded):
-        if decoded[0] == "#bundle":
-            msg = OSCBundle()
-            msg.setTimeTag(decoded[1])
-            for submsg in decoded[2:]:
-                msg.append(self._reencapsulate(submsg))
+        return self._binary
 
-        else:
-            msg = OSCMessage(decoded[0])
-            tags = decoded[1].lstrip(',')
-            for i in range(len(tags)):
-                msg.append(decoded[2+i], tags[i])
+    def _encodeItems(self, items):
+        """Returns the list of ('b', OSCMessage, binary) tuples encapsulating
+        the given list of (typehint, value) tuples.
+        """
+        bundle = OSCBundle(self.address)
+        for item in items:
+            bundle.append(item[1], item[0])
 
-        return msg
+        return bundle._args
 
     def values(self):
         """Returns a list of the OSCMessages appended so far."""
-        out = []
-        for decoded in decodeOSC(self.getBinary())[2:]:
-            out.append(self._reencapsulate(decoded))
+        return [arg[1].copy() for arg in self._args]
 
-        return out
+    def __getitem__(self, i):
+        """Returns the indicated OSCMessage (or slice)."""
+        if isinstance(i,slice):
+            return [arg[1].copy() for arg in self._args[i]]
+
+        return self._args[i][1].copy()
 
     def __eq__(self, other):
         """Return True if two OSCBundles have the same timetag & content."""
@@ -574,6 +695,145 @@ class OSCBundle(OSCMessage):
         return copy
 
 
+class MessageTemplate(object):
+    """OSC message with a fixed address and fixed typetags, for messages
+    sended again and again with new values, at every frame for example.
+
+    The address and the typetags are encoded only once. pack() writes the
+    new values after them, in a bytearray reused by every call, and returns
+    it, ready to be sended:
+        template = MessageTemplate("/blender/x", "f")
+        sender.send_to(template.pack(1.5), address)
+
+    Only fixed width typetags are allowed: 'i', 'f', 'd' and 'h'.
+    The returned bytearray is overwritten by the next pack(): send it
+    before, or copy it with bytes().
+    """
+    def __init__(self, address, typetags):
+        """'typetags' is a string with one typetag per value, with or
+        without the leading ','.
+        """
+        if not typetags.startswith(","):
+            typetags = "," + typetags
+        try:
+            fmt = "".join(_fixedFormats[tag] for tag in typetags[1:])
+        except KeyError:
+            raise OSCError("MessageTemplate typetags must be fixed width "
+                           "('i', 'f', 'd' or 'h'), not '%s'" % typetags)
+        self.address = address
+        self.typetags = typetags
+        self.header = OSCString(address) + OSCString(typetags)
+        self._struct = struct.Struct(">" + fmt)
+        self._offset = len(self.header)
+        self._buffer = bytearray(self.header) + bytes(self._struct.size)
+
+    def __len__(self):
+        """Returns the size of the binary messages."""
+        return len(self._buffer)
+
+    def __repr__(self):
+        return "MessageTemplate(%r, %r)" % (self.address, self.typetags)
+
+    def pack(self, *values):
+        """Returns the binary OSC message with 'values', one per typetag.
+        """
+        self._struct.pack_into(self._buffer, self._offset, *values)
+        return self._buffer
+
+
+class OSCPacketView(object):
+    """Read-only view of a binary OSC message, used like the list returned
+    by decodeOSC(): [address, typetags, argument, argument, ...].
+
+    The address and the typetags are read at creation, the arguments are
+    only decoded when read: a message dropped after a look at its address
+    costs almost nothing. An argument preceded only by fixed width
+    arguments ('i', 'f', 'd', 'h') is decoded alone, else all arguments
+    are decoded at the first read, and kept.
+    Decoding errors in the arguments are raised when they are read.
+
+    Returned by decodeOSC(data, lazy=True) and walkOSC(data, lazy=True).
+    """
+    __slots__ = ("address", "typetags", "_data", "_pos", "_values")
+
+    def __init__(self, data, address, typetags, pos):
+        """'data' is a memoryview of the whole message, 'pos' the position
+        of the first argument, after 'typetags'.
+        """
+        self.address = address
+        self.typetags = typetags
+        self._data = data
+        self._pos = pos
+        self._values = None
+
+    def _arguments(self):
+        """Returns the list of all decoded arguments."""
+        if self._values is None:
+            values = []
+            compiled = _compileTypetags(self.typetags)
+            if compiled is not None and \
+                                len(self._data) - self._pos >= compiled.size:
+                values.extend(compiled.unpack_from(self._data, self._pos))
+            else:
+                _readArguments(self._data, self._pos, self.typetags, values)
+            self._values = values
+
+        return self._values
+
+    def _argument(self, i):
+        """Returns the decoded argument number 'i'."""
+        if self._values is None:
+            offsets = _typetagLayout(self.typetags)[1]
+            if i < len(offsets):
+                reader, offset = offsets[i]
+                return reader.unpack_from(self._data, self._pos + offset)[0]
+
+        return self._arguments()[i]
+
+    def __len__(self):
+        return 2 + _typetagLayout(self.typetags)[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.tolist()[i]
+        size = len(self)
+        if i < 0:
+            i += size
+        if i == 0:
+            return self.address
+        elif i == 1:
+            return self.typetags
+        elif 1 < i < size:
+            return self._argument(i - 2)
+        raise IndexError("OSCPacketView index out of range")
+
+    def __iter__(self):
+        yield self.address
+        yield self.typetags
+        for value in self._arguments():
+            yield value
+
+    def __eq__(self, other):
+        if isinstance(other, (list, OSCPacketView)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def tolist(self):
+        """Returns the message as a list, as decoded by decodeOSC()."""
+        return [self.address, self.typetags] + self._arguments()
+
+
 ######
 #
 # OSCMessage encoding functions
@@ -585,8 +845,8 @@ def OSCString(next):
     The length of the resulting string is always a multiple of 4 bytes.
     The string ends with 1 to 4 zero-bytes ('\x00')
     """
-    OSCstringLength = math.ceil((len(next)+1) / 4.0) * 4
-    return struct.pack(">%ds" % (OSCstringLength), next.encode('latin-1'))
+    binary = next.encode('latin-1')
+    return binary + b'\0' * (4 - len(binary) % 4)
 
 def OSCBlob(next):
     """Convert a string into an OSC Blob.
@@ -609,14 +869,29 @@ def OSCArgument(next, typehint=None):
     """ Convert some Python types to their
     OSC binary representations, returning a
     (typetag, data) tuple.
+    Without typehint, None is encoded as 'N', booleans as 'T' or 'F', and
+    integers out of the 32-bit range as 'h'.
+    Typehints 'T', 'F', 'N' and 'I' have no data, 'next' is ignored.
+    Typehints 'r' and 'm' take a tuple of 4 integers from 0 to 255, or a
+    32-bit unsigned integer.
     """
     if not typehint:
-        if type(next) in FloatTypes:
-            binary  = struct.pack(">f", float(next))
+        if next is None:
+            binary = b''
+            tag = 'N'
+        elif type(next) in BoolTypes:
+            binary = b''
+            tag = 'T' if next else 'F'
+        elif type(next) in FloatTypes:
+            binary  = _Float.pack(float(next))
             tag = 'f'
         elif type(next) in IntTypes:
-            binary  = struct.pack(">i", int(next))
-            tag = 'i'
+            if -0x80000000 <= next <= 0x7fffffff:
+                binary  = _Int.pack(int(next))
+                tag = 'i'
+            else:
+                binary  = _Long.pack(int(next))
+                tag = 'h'
         else:
             binary  = OSCString(next)
             tag = 's'
@@ -643,12 +918,89 @@ def OSCArgument(next, typehint=None):
         except ValueError:
             binary  = OSCString(next)
             tag = 's'
+    elif typehint == 'h':
+        try:
+            binary  = struct.pack(">q", int(next))
+            tag = 'h'
+        except ValueError:
+            binary  = OSCString(next)
+            tag = 's'
+    elif typehint == 'c':
+        binary  = struct.pack(">i", ord(next))
+        tag = 'c'
+    elif typehint in ('r', 'm'):
+        if isinstance(next, (list, tuple)):
+            binary  = _Bytes4.pack(*next)
+        else:
+            binary  = struct.pack(">I", next)
+        tag = typehint
+    elif typehint in ('T', 'F', 'N', 'I'):
+        binary = b''
+        tag = typehint
+    elif typehint == 'S':
+        binary  = OSCString(next)
+        tag = 'S'
     else:
         binary  = OSCString(next)
         tag = 's'
 
     return (tag, binary)
 
+def OSCArray(values, typehint=None):
+    """Convert a numpy array of numbers to a list of one (typetags, value,
+    binary) tuple for all its elements, in C order, encoded in one call:
+    'typetags' is the typetag repeated for each element, 'value' is None and
+    'binary' the elements encoded one after the other. An empty array gives
+    an empty list.
+    Integers are encoded as 'i', or as 'h' if one of them is out of the
+    32-bit range, as integers appended one by one. Floats are encoded as
+    'f'. 'typehint' 'i', 'f', 'd' or 'h' sets the typetag of all elements.
+    Returns None if the array doesn't hold numbers, or if 'typehint' is
+    another typetag: the elements are then encoded one by one.
+    See _expandArgs() to split the tuple in one tuple per element.
+    """
+    kind = values.dtype.kind
+    if kind not in "iuf" or typehint not in (None, "i", "f", "d", "h"):
+        return None
+    if typehint:
+        tag = typehint
+    elif kind == "f":
+        tag = "f"
+    else:
+        tag = "i"
+
+    if kind in "iu" and tag in "ih" and values.size:
+        low, high = values.min(), values.max()
+        if tag == "i" and (low < -0x80000000 or high > 0x7fffffff):
+            if typehint:
+                raise OSCError("Integer out of int32 range in array")
+            tag = "h"
+        if high > 0x7fffffffffffffff:
+            raise OSCError("Integer out of int64 range in array")
+
+    if not values.size:
+        return []
+    encoded = numpy.ascontiguousarray(values.ravel(), _arrayDtypes[tag])
+    return [(tag * encoded.size, None, encoded.tobytes())]
+
+def _splitTypetags(typetags):
+    """Splits a typetag string in a list of one typetag per argument, an
+    OSC array '[...]' being one argument.
+    """
+    tags = []
+    depth = 0
+    for tag in typetags:
+        if depth:
+            tags[-1] += tag
+        else:
+            tags.append(tag)
+        if tag == '[':
+            depth += 1
+        elif tag == ']':
+            depth -= 1
+
+    return tags
+
 def OSCTimeTag(time):
     """Convert a time in floating seconds to its
     OSC binary representation
@@ -663,130 +1015,503 @@ def OSCTimeTag(time):
 
     return binary
 
+def OSCBundleDatagrams(binaries, maxSize=1024, time=0):
+    """Pack a list of binary OSC messages in as few datagrams as possible.
+    Each datagram is an OSC-bundle of at most 'maxSize' bytes, with the
+    timetag 'time'. The default 'maxSize' is the default buffer size of
+    Receive in send_receive.py. It can be up to 1472, the UDP payload of an
+    Ethernet frame (1500 bytes MTU minus IP and UDP headers), if the
+    receiver reads bigger datagrams.
+    A message bigger than 'maxSize' gets a datagram of its own. Without
+    timetag, a message alone in its datagram is not put in a bundle.
+    Returns the list of datagrams.
+    """
+    header = OSCString("#bundle") + OSCTimeTag(time)
+    datagrams = []
+    elements = []
+    size = len(header)
+    for binary in binaries:
+        if elements and size + 4 + len(binary) > maxSize:
+            datagrams.append(_bundleDatagram(header, elements, time))
+            elements = []
+            size = len(header)
+        elements.append(binary)
+        size += 4 + len(binary)
+    if elements:
+        datagrams.append(_bundleDatagram(header, elements, time))
+
+    return datagrams
+
+def _bundleDatagram(header, elements, time):
+    """Join bundle header and binary OSC messages in an OSC-bundle."""
+    if len(elements) == 1 and not time > 0:
+        return elements[0]
+
+    binary = [header]
+    for element in elements:
+        binary.append(struct.pack(">i", len(element)))
+        binary.append(element)
+
+    return b"".join(binary)
+
 ######
 #
 # OSCMessage decoding functions
 #
 ######
 
-def _readString(data):
+# Every reader below takes the whole packet (a memoryview) and the offset
+# of the value to read, and returns (value, offset of the next value).
+# No reader slices the rest of the packet, so decoding never copies it.
+
+_Int = struct.Struct(">i")
+_Long = struct.Struct(">q")
+_TimeTag = struct.Struct(">LL")
+_Float = struct.Struct(">f")
+_Double = struct.Struct(">d")
+_Bytes4 = struct.Struct(">BBBB")
+
+def _readString(data, pos=0):
     """Reads the next (null-terminated) block of data.
+    OSC strings are padded with nulls to a multiple of 4 bytes.
+    Raises OSCError if there is no terminating null (data isn't OSC), or
+    if the padding isn't null.
     """
-    length   = data.find(b'\0')
-    nextData = int(math.ceil((length+1) / 4.0) * 4)
-    readstring = (data[0:length].decode('latin-1'), data[nextData:])
-    return readstring
-
-def _readBlob(data):
+    size = len(data)
+    # Look for the first null in a copy of 64 bytes, twice bigger at each
+    # try: long typetag strings aren't read 4 bytes by 4 bytes
+    chunk = 64
+    raw = bytes(data[pos:pos+chunk])
+    length = raw.find(b'\0')
+    while length < 0 and pos + chunk < size:
+        chunk *= 2
+        raw = bytes(data[pos:pos+chunk])
+        length = raw.find(b'\0')
+    if length < 0:
+        raise OSCError("OSC-string lacks a terminating null")
+    # The string and its nulls fill a whole number of 4 bytes blocks, the
+    # block end is within 'raw' as the chunk size is a multiple of 4
+    block = (length // 4 + 1) * 4
+    if raw[length+1:block].strip(b'\0'):
+        raise OSCError("OSC-string padding isn't null")
+    return (raw[:length].decode('latin-1'), pos + block)
+
+def _readBlob(data, pos=0):
     """Reads the next (numbered) block of data
     """
+    length = _Int.unpack_from(data, pos)[0]
+    nextData = pos + int(math.ceil((length) / 4.0) * 4) + 4
+    return (bytes(data[pos+4:pos+4+length]), nextData)
 
-    length   = struct.unpack(">i", data[0:4])[0]
-    nextData = int(math.ceil((length) / 4.0) * 4) + 4
-    return (data[4:length+4], data[nextData:])
-
-def _readInt(data):
+def _readInt(data, pos=0):
     """Tries to interpret the next 4 bytes of the data
     as a 32-bit integer. """
 
-    if(len(data)<4):
-        print("Error: too few bytes for int", data, len(data))
-        rest = data
-        integer = 0
-    else:
-        integer = struct.unpack(">i", data[0:4])[0]
-        rest    = data[4:]
+    if(len(data) - pos < 4):
+        print("Error: too few bytes for int", bytes(data[pos:]),
+                                                        len(data) - pos)
+        return (0, pos)
 
-    return (integer, rest)
+    return (_Int.unpack_from(data, pos)[0], pos + 4)
 
-def _readLong(data):
+def _readLong(data, pos=0):
     """Tries to interpret the next 8 bytes of the data
     as a 64-bit signed integer.
      """
+    return (_Long.unpack_from(data, pos)[0], pos + 8)
 
-    high, low = struct.unpack(">ll", data[0:8])
-    big = (int(high) << 32) + low
-    rest = data[8:]
-    return (big, rest)
-
-def _readTimeTag(data):
+def _readTimeTag(data, pos=0):
     """Tries to interpret the next 8 bytes of the data
     as a TimeTag.
      """
-    high, low = struct.unpack(">LL", data[0:8])
+    high, low = _TimeTag.unpack_from(data, pos)
     if (high == 0) and (low <= 1):
         time = 0.0
     else:
         time = int(NTP_epoch + high) + float(low / NTP_units_per_second)
-    rest = data[8:]
-    return (time, rest)
+    return (time, pos + 8)
 
-def _readFloat(data):
+def _readFloat(data, pos=0):
     """Tries to interpret the next 4 bytes of the data
     as a 32-bit float.
     """
 
-    if(len(data)<4):
-        print("Error: too few bytes for float", data, len(data))
-        rest = data
-        float = 0
-    else:
-        float = struct.unpack(">f", data[0:4])[0]
-        rest  = data[4:]
+    if(len(data) - pos < 4):
+        print("Error: too few bytes for float", bytes(data[pos:]),
+                                                        len(data) - pos)
+        return (0, pos)
 
-    return (float, rest)
+    return (_Float.unpack_from(data, pos)[0], pos + 4)
 
-def _readDouble(data):
+def _readDouble(data, pos=0):
     """Tries to interpret the next 8 bytes of the data
     as a 64-bit float.
     """
 
-    if(len(data)<8):
-        print("Error: too few bytes for double", data, len(data))
-        rest = data
-        float = 0
-    else:
-        float = struct.unpack(">d", data[0:8])[0]
-        rest  = data[8:]
+    if(len(data) - pos < 8):
+        print("Error: too few bytes for double", bytes(data[pos:]),
+                                                        len(data) - pos)
+        return (0, pos)
 
-    return (float, rest)
+    return (_Double.unpack_from(data, pos)[0], pos + 8)
 
-def decodeOSC(data):
-    """Converts a binary OSC message to a Python list.
+def _readChar(data, pos=0):
+    """Reads the next 4 bytes of the data as an ASCII character, encoded as
+    a 32-bit integer.
+    """
+    value, pos = _readInt(data, pos)
+    return (chr(value), pos)
+
+def _readBytes4(data, pos=0):
+    """Reads the next 4 bytes of the data as a tuple of 4 integers, for an
+    RGBA color (red, green, blue, alpha) or a MIDI message (port id,
+    status byte, data1, data2).
+    """
+    return (_Bytes4.unpack_from(data, pos), pos + 4)
+
+def _readTrue(data, pos=0):
+    """'T' has no data."""
+    return (True, pos)
+
+def _readFalse(data, pos=0):
+    """'F' has no data."""
+    return (False, pos)
+
+def _readNil(data, pos=0):
+    """'N' has no data."""
+    return (None, pos)
+
+def _readInfinitum(data, pos=0):
+    """'I' has no data."""
+    return (float("inf"), pos)
+
+_readers = {"i":_readInt, "f":_readFloat, "s":_readString, "b":_readBlob,
+            "d":_readDouble, "t":_readTimeTag, "h":_readLong, "c":_readChar,
+            "r":_readBytes4, "m":_readBytes4, "T":_readTrue, "F":_readFalse,
+            "N":_readNil, "I":_readInfinitum, "S":_readString}
+
+def _argumentValue(arg):
+    """Returns the value of an OSCMessage (typetag, value, binary) tuple,
+    decoding 'binary' if the value isn't stored. 'N' decodes to None.
+    """
+    if arg[1] is None:
+        return _readers[arg[0]](arg[2])[0]
+    return arg[1]
+
+def _expandArgs(args):
+    """Returns the list of (typetag, value, binary) tuples 'args', the
+    tuples of several array elements made by OSCArray() being split in one
+    tuple per element. Their typetags are the same, so are their widths.
+    """
+    expanded = []
+    for arg in args:
+        tags = arg[0]
+        if len(tags) > 1 and tags[0] != '[':
+            binary = arg[2]
+            width = len(binary) // len(tags)
+            expanded.extend(zip(tags, itertools.repeat(None),
+                                [binary[pos:pos+width] for pos in
+                                 range(0, len(binary), width)]))
+        else:
+            expanded.append(arg)
+
+    return expanded
+
+# struct format of the typetags that have a fixed width and need no
+# conversion after unpacking
+_fixedFormats = {"i":"i", "f":"f", "d":"d", "h":"q"}
+
+@functools.lru_cache(maxsize=256)
+def _compileTypetags(typetags):
+    """Returns a struct.Struct unpacking all the arguments described by
+    'typetags' in a single call, or None if one of the typetags has no
+    fixed width (string, blob ...) and needs the generic, per-tag reader.
+    Results are kept in a bounded LRU cache keyed on the typetag string.
+    """
+    try:
+        fmt = "".join(_fixedFormats[tag] for tag in typetags[1:])
+    except KeyError:
+        return None
+    return struct.Struct(">" + fmt)
+
+# numpy dtype and array.array typecode of the typetags decoded as arrays
+_arrayDtypes = {"i":">i4", "f":">f4", "d":">f8", "h":">i8"}
+_arrayCodes = {"i":"i", "f":"f", "d":"d", "h":"q"}
+
+def _readArray(data, pos, tag, count):
+    """Reads 'count' consecutive 'tag' values as one array.
+    With numpy, returns a numpy array sharing the memory of 'data', which
+    must then not be modified while the array is used. Without numpy,
+    returns an array.array holding a copy.
+    """
+    end = pos + count * struct.calcsize(_fixedFormats[tag])
+    if end > len(data):
+        raise OSCError("Not enough data for %d '%s' values" % (count, tag))
+    if numpy is not None:
+        return (numpy.frombuffer(data, _arrayDtypes[tag], count, pos), end)
+
+    values = array.array(_arrayCodes[tag])
+    values.frombytes(data[pos:end])
+    if sys.byteorder == "little":
+        values.byteswap()
+    return (values, end)
+
+# struct.Struct of the fixed width typetags
+_fixedStructs = {"i":_Int, "f":_Float, "d":_Double, "h":_Long}
+
+@functools.lru_cache(maxsize=256)
+def _typetagLayout(typetags):
+    """Returns (number of arguments, offsets) for 'typetags', an OSC array
+    being one argument. 'offsets' is a tuple of (struct.Struct, offset) of
+    the arguments before the first one without fixed width.
+    """
+    tags = _splitTypetags(typetags[1:])
+    offsets = []
+    offset = 0
+    for tag in tags:
+        if tag not in _fixedStructs:
+            break
+        offsets.append((_fixedStructs[tag], offset))
+        offset += _fixedStructs[tag].size
+    return (len(tags), tuple(offsets))
+
+@functools.lru_cache(maxsize=256)
+def _typetagRuns(typetags):
+    """Returns the typetags as a tuple of (tag, count) runs of the same
+    tag."""
+    runs = []
+    for tag in typetags[1:]:
+        if runs and runs[-1][0] == tag:
+            runs[-1][1] += 1
+        else:
+            runs.append([tag, 1])
+    return tuple((tag, count) for tag, count in runs)
+
+def _readArguments(data, pos, typetags, decoded, arrays=False):
+    """Reads the arguments described by 'typetags' and appends them to the
+    list 'decoded'. An OSC array, between '[' and ']', is appended as a
+    list. With 'arrays' True, runs of 'i', 'f', 'd' or 'h' are read with
+    _readArray().
+    Returns the position after the arguments.
+    """
+    values = decoded
+    stack = []
+    for tag, count in _typetagRuns(typetags):
+        if arrays and tag in _arrayDtypes:
+            value, pos = _readArray(data, pos, tag, count)
+            values.append(value)
+        elif tag == "[":
+            for i in range(count):
+                stack.append(values)
+                values = []
+        elif tag == "]":
+            for i in range(count):
+                if not stack:
+                    raise OSCError("Unbalanced ']' in typetags '%s'" %
+                                   typetags)
+                parent = stack.pop()
+                parent.append(values)
+                values = parent
+        else:
+            try:
+                reader = _readers[tag]
+            except KeyError:
+                raise OSCError("Unknown typetag '%s' in '%s'" % (tag,
+                                                                 typetags))
+            for i in range(count):
+                value, pos = reader(data, pos)
+                values.append(value)
+    if stack:
+        raise OSCError("Unbalanced '[' in typetags '%s'" % typetags)
+    return pos
+
+def decoderCacheInfo():
+    """Returns the (hits, misses, maxsize, currsize) named tuple of the
+    typetag decoder cache.
+    """
+    return _compileTypetags.cache_info()
+
+def clearDecoderCache():
+    """Empties the typetag decoder cache and resets its counters."""
+    _compileTypetags.cache_clear()
+
+# Limits of walkOSC(), MAX_DEPTH is also the limit of decodeOSC()
+MAX_DEPTH = 32
+MAX_ELEMENTS = 4096
+MAX_SIZE = 65536
+# No limit of bundle elements in decodeOSC()
+_NO_LIMIT = float("inf")
+
+def _decodeMessage(data, address, pos, arrays=False, lazy=False):
+    """Converts the OSC message filling the whole memoryview 'data' to a
+    Python list, or to an OSCPacketView if 'lazy'. 'address' is already
+    read, 'pos' is the position after it.
     """
-    table = {"i":_readInt, "f":_readFloat, "s":_readString, "b":_readBlob,
-            "d":_readDouble, "t":_readTimeTag}
     decoded = []
-    address,  rest = _readString(data)
     if address.startswith(","):
         typetags = address
         address = ""
     else:
         typetags = ""
 
-    if address == "#bundle":
-        time, rest = _readTimeTag(rest)
-        decoded.append(address)
-        decoded.append(time)
-        while len(rest)>0:
-            length, rest = _readInt(rest)
-            decoded.append(decodeOSC(rest[:length]))
-            rest = rest[length:]
-
-    elif len(rest)>0:
+    size = len(data)
+    if pos < size:
         if not len(typetags):
-            typetags, rest = _readString(rest)
+            typetags, pos = _readString(data, pos)
         decoded.append(address)
         decoded.append(typetags)
-        if typetags.startswith(","):
-            for tag in typetags[1:]:
-                value, rest = table[tag](rest)
-                decoded.append(value)
+        if typetags.startswith(",") and lazy:
+            return OSCPacketView(data, address, typetags, pos)
+        elif typetags.startswith(","):
+            compiled = None if arrays else _compileTypetags(typetags)
+            if compiled is not None and size - pos >= compiled.size:
+                decoded.extend(compiled.unpack_from(data, pos))
+            else:
+                _readArguments(data, pos, typetags, decoded, arrays)
         else:
             raise OSCError("OSCMessage's typetag-string lacks the magic ','")
 
     return decoded
 
+def _readBundleTimeTag(data, pos):
+    """Reads the timetag following the '#bundle' address of a bundle.
+    Raises OSCError if 'data' ends before it.
+    """
+    if pos + _TimeTag.size > len(data):
+        raise OSCError("Bundle lacks its timetag")
+    return _readTimeTag(data, pos)
+
+def _walkBundle(data, pos, bundle, arrays, lazy, maxDepth, maxElements):
+    """Generator of the (bundle, message) tuples of the bundle filling the
+    whole memoryview 'data', its elements starting at 'pos'. 'bundle' is
+    its [address, time] list, each message is given with the list of the
+    bundle holding it, the lists of the sub-bundles being appended to
+    their parent when found. An empty element gives an empty message.
+    Bundles are walked with a stack, not recursively, and elements are
+    decoded from zero-copy slices of 'data'.
+    Raises OSCError if bundles are nested deeper than 'maxDepth' levels, if
+    there are more than 'maxElements' bundle elements, if an element size
+    is out of its bundle or if a sub-bundle lacks its timetag.
+    """
+    size = len(data)
+    elements = 0
+    # [(parent bundle, parent data, position in parent data), ...]
+    stack = []
+    while True:
+        if pos < size:
+            if pos + 4 > size:
+                raise OSCError("Truncated bundle element size")
+            length = _Int.unpack_from(data, pos)[0]
+            pos += 4
+            if length < 0 or pos + length > size:
+                raise OSCError("Bundle element size %d out of the bundle" %
+                               length)
+            elements += 1
+            if elements > maxElements:
+                raise OSCError("More than %d bundle elements" % maxElements)
+            element = data[pos:pos+length]
+            pos += length
+            if not length:
+                yield (bundle, [])
+                continue
+            address, elementPos = _readString(element)
+            if address == "#bundle":
+                if len(stack) + 2 > maxDepth:
+                    raise OSCError("Bundles nested deeper than %d levels" %
+                                   maxDepth)
+                time, elementPos = _readBundleTimeTag(element, elementPos)
+                subBundle = [address, time]
+                bundle.append(subBundle)
+                stack.append((bundle, data, pos))
+                bundle, data, pos = subBundle, element, elementPos
+                size = len(data)
+            else:
+                yield (bundle, _decodeMessage(element, address, elementPos,
+                                              arrays, lazy))
+        elif stack:
+            bundle, data, pos = stack.pop()
+            size = len(data)
+        else:
+            return
+
+def _decode(data, arrays=False, lazy=False):
+    """Converts the OSC message or bundle filling the whole memoryview
+    'data' to a Python list.
+    Bundles can't be nested deeper than MAX_DEPTH levels, see
+    _walkBundle().
+    Raises OSCError if a bundle element size is out of its bundle.
+    """
+    if not len(data):
+        return []
+    address, pos = _readString(data)
+    if address != "#bundle":
+        return _decodeMessage(data, address, pos, arrays, lazy)
+
+    time, pos = _readBundleTimeTag(data, pos)
+    decoded = [address, time]
+    for bundle, message in _walkBundle(data, pos, decoded, arrays, lazy,
+                                       MAX_DEPTH, _NO_LIMIT):
+        bundle.append(message)
+    return decoded
+
+def walkOSC(data, arrays=False, maxDepth=MAX_DEPTH, maxElements=MAX_ELEMENTS,
+            maxSize=MAX_SIZE, lazy=False):
+    """Generator of the messages of a binary OSC packet, decoded one by one
+    as by decodeOSC(): the message alone, or the messages of the bundle and
+    of its sub-bundles, in order. A message is only decoded when the
+    previous one is consumed, the rest of the packet is never copied.
+    With 'lazy' True, messages are given as OSCPacketView.
+    Raises OSCError if 'data' is bigger than 'maxSize' bytes, if bundles
+    are nested deeper than 'maxDepth' levels, if there are more than
+    'maxElements' bundle elements, or if an element size is wrong.
+    """
+    data = memoryview(data)
+    size = len(data)
+    if size > maxSize:
+        raise OSCError("OSC packet of %d bytes, bigger than %d" % (size,
+                                                                   maxSize))
+    if not size:
+        return
+    address, pos = _readString(data)
+    if address != "#bundle":
+        message = _decodeMessage(data, address, pos, arrays, lazy)
+        if message:
+            yield message
+        return
+
+    time, pos = _readBundleTimeTag(data, pos)
+    for bundle, message in _walkBundle(data, pos, [address, time], arrays,
+                                       lazy, maxDepth, maxElements):
+        if message:
+            yield message
+
+def decodeOSC(data, arrays=False, lazy=False):
+    """Converts a binary OSC message to a Python list.
+    'data' can be bytes, a bytearray or a memoryview, it is never copied.
+    With 'arrays' True, each run of consecutive 'i', 'f' or 'd' arguments
+    is returned as one array instead of Python numbers: a numpy array
+    reading 'data' in place if numpy is installed, an array.array else.
+    Example: ',sfff' gives [address, ',sfff', string, array of 3 floats].
+    With 'lazy' True, messages are returned as OSCPacketView, decoding
+    their arguments only when read. 'arrays' is then ignored.
+    """
+    return _decode(memoryview(data), arrays, lazy)
+
+def flattenOSC(decoded):
+    """Returns the list of the messages in 'decoded', as returned by
+    decodeOSC(): the message alone, or the messages of the bundle and of its
+    sub-bundles, in order. Empty messages are skipped. A string, data
+    received without OSC, gives an empty list.
+    """
+    if not decoded or isinstance(decoded, str):
+        return []
+    if decoded[0] != "#bundle":
+        return [decoded]
+    messages = []
+    for element in decoded[2:]:
+        messages.extend(flattenOSC(element))
+    return messages
+
 
 if __name__ == '__main__':
     print("Decode some OSC message and bundle from pure data: \n")
@@ -802,6 +1527,33 @@ if __name__ == '__main__':
         dec = decodeOSC(d)
         print(dec)
 
+    # Same lists as decoded by the first OSCcodec.py
+    expected = [['/ping', ',f', 3.141590118408203],
+                ['/ping', ',f', 3.141590118408203],
+                ['/ham/egg', ',si', 'pig', 6],
+                ['/a/b/c/d/e', ',si', 'xxxxx', 2],
+                ['/', ','],
+                ['/cheese/cheddar', ',s', 'brie'],
+                ['#bundle', 0.0, ['/ping', ',f', 3.141590118408203],
+                 ['/cheese/cheddar', ',s', 'brie']]]
+    for d, e in zip(data, expected):
+        assert decodeOSC(d) == e, (d, e)
+        assert decodeOSC(bytearray(d)) == e, (d, e)
+        assert decodeOSC(memoryview(d)) == e, (d, e)
+        assert [m for m in walkOSC(d)] == (e[2:] if e[0] == "#bundle"
+                                           else [e]), (d, e)
+    assert decodeOSC(b'') == []
+
+    # Plain text isn't OSC: Receive falls back to utf-8
+    for text in (b'hello', b'hello world', b'/no/null'):
+        try:
+            decodeOSC(text)
+        except OSCError:
+            pass
+        else:
+            raise AssertionError("decodeOSC(%r) should raise OSCError" % text)
+    print("Decoded as before, plain text raises OSCError\n")
+
     print("Create some OSC message and bundle:\n")
     msg = OSCMessage("/my/osc/address")
     msg.append('è')
@@ -0,0 +1,217 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+## async_osc.py
+
+#############################################################################
+# Copyright (C) Labomedia July 2014
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franproplin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+#############################################################################
+
+
+'''
+Not to be used in the Blender 3D Game Engine, which doesn't accept asyncio:
+use Receive and Send in send_receive.py there.
+
+OSC over UDP with asyncio, messages are encoded and decoded with OSCcodec.py.
+
+Receive with OSCProtocol, messages are given to a callback, or read with
+"async for":
+
+    transport, protocol = await create_server("127.0.0.1", 9000)
+    async for message, addr in protocol:
+        print(message)
+
+Send with AsyncSender. Messages sent during the same loop iteration are
+written together, packed in OSC-bundles if bundle=True:
+
+    sender = await open_sender()
+    sender.send(OSCMessage("/spam", 1.0), ("127.0.0.1", 8000))
+'''
+
+
+import asyncio
+import socket
+
+try:
+    # to run standalone
+    from OSCcodec import OSCBundleDatagrams, decodeOSC, flattenOSC
+except:
+    # to run in blender scripts directory
+    from scripts.OSCcodec import OSCBundleDatagrams, decodeOSC, flattenOSC
+
+
+class OSCProtocol(asyncio.DatagramProtocol):
+    '''Receive and decode OSC message with asyncio.'''
+
+    def __init__(self, callback=None, queue_size=1024, flatten=True,
+                 verbose=False):
+        '''callback = function(message, addr) called for each message,
+                   if None, messages are read with "async for"
+        queue_size = integer, max number of messages waiting to be read with
+                     "async for", the next ones are dropped
+        flatten = True gives the messages in bundles one by one,
+                  False gives the bundles as decoded by decodeOSC()
+        verbose = True is very verbose in terminal
+        '''
+        self.callback = callback
+        self.flatten = flatten
+        self.verb = verbose
+        self.queue = asyncio.Queue(queue_size)
+        self.transport = None
+        self.closed = False
+        self.dropped = 0
+        self.errors = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        '''End the "async for" loops when the transport is closed.'''
+        self.closed = True
+        try:
+            # Wake up a loop waiting for the next message
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            # Nobody is waiting, the loop ends when the queue is empty
+            pass
+
+    def datagram_received(self, data, addr):
+        try:
+            decoded = decodeOSC(data)
+        except Exception:
+            self.errors += 1
+            if self.verb:
+                print('No OSC message in {0}'.format(data))
+            return
+
+        if not decoded:
+            return
+        if self.flatten and decoded[0] == "#bundle":
+            for message in flattenOSC(decoded):
+                self._deliver(message, addr)
+        else:
+            self._deliver(decoded, addr)
+
+    def _deliver(self, message, addr):
+        if self.verb:
+            print("Decoded OSC message from {0}: {1}".format(addr, message))
+        if self.callback is not None:
+            self.callback(message, addr)
+            return
+        try:
+            self.queue.put_nowait((message, addr))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def error_received(self, exc):
+        if self.verb:
+            print('Error received: {0}'.format(exc))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        '''Return the next (message, addr) received. The iteration stops
+        when the transport is closed and all messages are read.'''
+        if self.closed and self.queue.empty():
+            raise StopAsyncIteration
+        item = await self.queue.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+
+async def create_server(ip, port, callback=None, **kwargs):
+    '''Plug an UDP socket on (ip, port), return (transport, OSCProtocol).
+    kwargs are given to OSCProtocol.
+    '''
+    loop = asyncio.get_running_loop()
+    return await loop.create_datagram_endpoint(
+                                lambda: OSCProtocol(callback, **kwargs),
+                                local_addr=(ip, port))
+
+
+class AsyncSender:
+    '''Send OSC message with asyncio.
+
+    send() only queues the message, all messages queued during a loop
+    iteration are written by flush() at the next one.
+    '''
+
+    def __init__(self, transport, bundle=True, max_size=1024, verbose=False):
+        '''transport = asyncio datagram transport
+        bundle = True packs the messages to the same address in OSC-bundles
+                 of at most max_size bytes
+        max_size = integer, max size of a bundle, default is the default
+                   buffer_size of Receive
+        verbose = True is very verbose in terminal
+        '''
+        self.transport = transport
+        self.bundle = bundle
+        self.max_size = max_size
+        self.verb = verbose
+        self.pending = {}
+        self.scheduled = False
+        self.datagrams = 0
+        self.messages = 0
+
+    def send(self, msg, address):
+        '''Queue msg to address = (ip, port)
+        msg is an OSC message create with OSCMessage(), or its binary, as
+        returned by MessageTemplate.pack(), or a memoryview of it.
+        '''
+        if isinstance(msg, (bytes, bytearray, memoryview)):
+            # A template buffer is overwritten by its next pack()
+            msg = bytes(msg)
+        else:
+            msg = msg.getBinary()
+        self.pending.setdefault(address, []).append(msg)
+        if not self.scheduled:
+            self.scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        '''Write all queued messages.'''
+        self.scheduled = False
+        pending, self.pending = self.pending, {}
+        for address, binaries in pending.items():
+            self.messages += len(binaries)
+            if self.bundle:
+                binaries = OSCBundleDatagrams(binaries, self.max_size)
+            for datagram in binaries:
+                self.transport.sendto(datagram, address)
+            self.datagrams += len(binaries)
+            if self.verb:
+                print("{0} datagrams sended to {1}".format(len(binaries),
+                                                          address))
+
+    def close(self):
+        '''Write queued messages and close the transport.'''
+        self.flush()
+        self.transport.close()
+
+
+async def open_sender(**kwargs):
+    '''Create an UDP socket, return an AsyncSender.
+    kwargs are given to AsyncSender.
+    '''
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+                                asyncio.DatagramProtocol,
+                                family=socket.AF_INET)
+    return AsyncSender(transport, **kwargs)
@@ -0,0 +1,402 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+## benchmark.py
+
+#############################################################################
+# Copyright (C) Labomedia July 2014
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franproplin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+#############################################################################
+
+'''
+Measure the cost of OSCcodec.py and send_receive.py calls, as made at
+every game frame.
+
+Run in terminal, without Blender:
+    python3 benchmark.py
+
+Each benchmark prints the mean time of one operation in microseconds,
+lower is better. Rates in messages per second are converted to
+microseconds per message.
+
+Save the results as a baseline, then compare later runs with it:
+    python3 benchmark.py --save baseline.json
+    python3 benchmark.py --compare baseline.json --threshold 0.2
+
+With --compare, the exit status is 1 if a benchmark is slower than the
+baseline by more than threshold (0.2 = 20 %). Only compare runs made on the
+same computer. -k runs only the benchmarks whose name contains a word:
+    python3 benchmark.py -k decode
+'''
+
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import socket
+import sys
+import time
+
+from OSCcodec import OSCMessage, OSCBundle, decodeOSC
+from send_receive import Receive, Send, FanOutSend, MultiReceive
+from async_osc import create_server, open_sender
+from tcp_osc import TCPSend, TCPReceive
+
+
+def timeit(func, number, repeat=1):
+    '''Return the mean duration of func() in microseconds, best of repeat
+    runs, after one call not timed. The garbage collector is disabled while
+    timing, as in the timeit module.'''
+    # Warm up caches before timing
+    func()
+    best = None
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for r in range(repeat):
+            start = time.perf_counter()
+            for i in range(number):
+                func()
+            duration = (time.perf_counter() - start) / number * 1e6
+            if best is None or duration < best:
+                best = duration
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return best
+
+
+# Messages of the codec benchmarks
+def _single():
+    return OSCMessage("/pos-X", 1.5)
+
+def _wide():
+    return OSCMessage("/skeleton", [0.5 * i for i in range(256)])
+
+def _strings():
+    return OSCMessage("/names", ["name number {0}".format(i)
+                                 for i in range(32)])
+
+def _nested():
+    '''A bundle of 3 bundles of 4 messages.'''
+    bundle = OSCBundle()
+    for i in range(3):
+        sub = OSCBundle()
+        for j in range(4):
+            sub.append(OSCMessage("/track/{0}/{1}".format(i, j), [i, j, 1.5]))
+        bundle.append(sub)
+    return bundle
+
+def bench_encode(make, number=2000):
+    '''Create a message with make() and encode it with getBinary().'''
+    return timeit(lambda: make().getBinary(), number, 5)
+
+def bench_decode(make, number=5000):
+    '''decodeOSC() of the message created with make().'''
+    binary = make().getBinary()
+    return timeit(lambda: decodeOSC(binary), number, 5)
+
+def bench_bundle_append(number=2000, messages=10):
+    '''OSCBundle.append() of a message, mean time per message.'''
+    msgs = [OSCMessage("/bench/{0}".format(i), [i, 1.5]) for i in
+                                                            range(messages)]
+
+    def build():
+        bundle = OSCBundle()
+        for msg in msgs:
+            bundle.append(msg)
+
+    return timeit(build, number, 5) / messages
+
+def bench_loaded_get_data(number=2000):
+    '''Receive.get_data() with a message waiting at each call.'''
+    receiver = Receive("127.0.0.1", 0, rcvbuf_size=1 << 22)
+    address = receiver.sock.getsockname()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    binary = _single().getBinary()
+    best = None
+    for r in range(5):
+        for i in range(number):
+            sock.sendto(binary, address)
+        time.sleep(0.01)
+        duration = timeit(receiver.get_data, number)
+        if best is None or duration < best:
+            best = duration
+    sock.close()
+    receiver.sock.close()
+    return best
+
+def bench_simple_send_to(number=5000):
+    '''Send.simple_send_to() of a float.'''
+    receiver = Receive("127.0.0.1", 0)
+    address = receiver.sock.getsockname()
+    sender = Send(verbose=False)
+    duration = timeit(lambda: sender.simple_send_to("/pos-X", 1.5, address),
+                      number, 5)
+    sender.sock.close()
+    receiver.sock.close()
+    return duration
+
+def bench_loopback(number=20000, burst=100):
+    '''Send.simple_send_to() and Receive.drain() on 127.0.0.1, by bursts
+    of burst messages, return the mean time per message received.'''
+    receiver = Receive("127.0.0.1", 0, rcvbuf_size=1 << 22)
+    address = receiver.sock.getsockname()
+    sender = Send(verbose=False)
+    received = 0
+    start = time.perf_counter()
+    for i in range(number // burst):
+        for j in range(burst):
+            sender.simple_send_to("/pos-X", 1.5, address)
+        received += len(receiver.drain())
+    received += len(receiver.drain())
+    duration = (time.perf_counter() - start) / max(received, 1) * 1e6
+    sender.sock.close()
+    receiver.sock.close()
+    return duration
+
+def bench_idle_get_data(number=10000):
+    '''get_data() on a port where nothing is received, as in every frame
+    without incomming message.
+    '''
+    receiver = Receive("127.0.0.1", 0)
+    duration = timeit(receiver.get_data, number)
+    receiver.sock.close()
+    return duration
+
+def bench_multi_idle(number=10000, ports=12):
+    '''MultiReceive.drain() on ports where nothing is received, one
+    select() for all of them.
+    '''
+    receiver = MultiReceive([("127.0.0.1", 0)] * ports)
+    duration = timeit(receiver.drain, number)
+    receiver.close()
+    return duration
+
+def bench_asyncio_loopback(number=20000, bundle=True):
+    '''Messages per second sent with AsyncSender and received with
+    OSCProtocol on 127.0.0.1.
+    '''
+    return asyncio.run(_asyncio_loopback(number, bundle))
+
+async def _asyncio_loopback(number, bundle):
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    received = [0]
+
+    def callback(message, addr):
+        received[0] += 1
+        if received[0] == number and not done.done():
+            done.set_result(None)
+
+    transport, protocol = await create_server("127.0.0.1", 0, callback)
+    transport.get_extra_info('socket').setsockopt(socket.SOL_SOCKET,
+                                                  socket.SO_RCVBUF, 1 << 20)
+    address = transport.get_extra_info('sockname')
+    sender = await open_sender(bundle=bundle)
+    msg = OSCMessage("/bench", 1.0).getBinary()
+
+    start = time.perf_counter()
+    for i in range(number):
+        sender.send(msg, address)
+        # let the loop flush and receive every 100 messages, with at most
+        # 500 messages not yet received, to not overflow the socket buffer
+        if i % 100 == 99:
+            await asyncio.sleep(0)
+            deadline = time.perf_counter() + 1
+            while received[0] < i - 500 and time.perf_counter() < deadline:
+                await asyncio.sleep(0)
+    try:
+        await asyncio.wait_for(done, 5)
+    except asyncio.TimeoutError:
+        pass
+    duration = time.perf_counter() - start
+
+    sender.close()
+    transport.close()
+    return received[0] / duration
+
+def bench_send_loop(number=10000, destinations=3):
+    '''Send.send_to() called for each message and destination, return the
+    mean time per datagram.'''
+    sender, receivers, pairs = _send_setup(number, destinations)
+    msg = OSCMessage("/bench", 1.0)
+
+    def send():
+        for payload, address in pairs:
+            sender.send_to(msg, address)
+
+    duration = timeit(send, 1) / len(pairs)
+    _send_teardown(sender, receivers)
+    return duration
+
+def bench_send_many(number=10000, destinations=3):
+    '''Send.send_many() with all messages and destinations, return the
+    mean time per datagram.'''
+    sender, receivers, pairs = _send_setup(number, destinations)
+    duration = timeit(lambda: sender.send_many(pairs), 1) / len(pairs)
+    _send_teardown(sender, receivers)
+    return duration
+
+def bench_fanout(number=10000, destinations=3):
+    '''FanOutSend.send() of one message to all destinations, return the
+    mean time per datagram.'''
+    sender, receivers, pairs = _send_setup(number, destinations)
+    sender.sock.close()
+    fanout = FanOutSend(receiver.sock.getsockname() for receiver in receivers)
+    msg = OSCMessage("/bench", 1.0)
+    duration = timeit(lambda: fanout.send(msg), number) / destinations
+    fanout.close()
+    for receiver in receivers:
+        receiver.sock.close()
+    return duration
+
+def _send_setup(number, destinations):
+    receivers = [Receive("127.0.0.1", 0, rcvbuf_size=1 << 22)
+                 for i in range(destinations)]
+    addresses = [receiver.sock.getsockname() for receiver in receivers]
+    binary = OSCMessage("/bench", 1.0).getBinary()
+    pairs = [(binary, address) for i in range(number)
+                               for address in addresses]
+    return Send(verbose=False), receivers, pairs
+
+def _send_teardown(sender, receivers):
+    sender.sock.close()
+    for receiver in receivers:
+        receiver.sock.close()
+
+def bench_tcp_loopback(framing, number=20000, burst=100):
+    '''TCPSend in batch mode, flushed every burst messages, and
+    TCPReceive.drain() on 127.0.0.1, return the mean time per message
+    received.'''
+    receiver = TCPReceive("127.0.0.1", 0, framing=framing)
+    sender = TCPSend(*receiver.sock.getsockname(), framing=framing,
+                     batch=True)
+    binary = _single().getBinary()
+    received = 0
+    start = time.perf_counter()
+    for i in range(number // burst):
+        for j in range(burst):
+            sender.send(binary)
+        sender.flush()
+        received += len(receiver.drain())
+    deadline = time.perf_counter() + 1
+    while received < number and time.perf_counter() < deadline:
+        received += len(receiver.drain())
+    duration = (time.perf_counter() - start) / max(received, 1) * 1e6
+    sender.close()
+    receiver.close()
+    return duration
+
+
+# (name, function returning microseconds per operation)
+BENCHMARKS = [
+    ("encode_single", lambda: bench_encode(_single)),
+    ("encode_wide_floats", lambda: bench_encode(_wide, 200)),
+    ("encode_strings", lambda: bench_encode(_strings, 500)),
+    ("encode_nested_bundle", lambda: bench_encode(_nested, 200)),
+    ("decode_single", lambda: bench_decode(_single)),
+    ("decode_wide_floats", lambda: bench_decode(_wide, 1000)),
+    ("decode_strings", lambda: bench_decode(_strings, 1000)),
+    ("decode_nested_bundle", lambda: bench_decode(_nested, 1000)),
+    ("bundle_append", bench_bundle_append),
+    ("get_data_idle", bench_idle_get_data),
+    ("multi_receive_idle_12_ports", bench_multi_idle),
+    ("get_data_loaded", bench_loaded_get_data),
+    ("simple_send_to", bench_simple_send_to),
+    ("loopback_send_receive", bench_loopback),
+    ("asyncio_loopback_bundles",
+            lambda: 1e6 / bench_asyncio_loopback(bundle=True)),
+    ("asyncio_loopback_datagrams",
+            lambda: 1e6 / bench_asyncio_loopback(bundle=False)),
+    ("send_to_loop", bench_send_loop),
+    ("send_many", bench_send_many),
+    ("fanout_send", bench_fanout),
+    ("tcp_loopback_slip", lambda: bench_tcp_loopback("slip")),
+    ("tcp_loopback_length", lambda: bench_tcp_loopback("length")),
+]
+
+
+def run(keywords=None, verbose=True):
+    '''Run the benchmarks whose name contains one of keywords, all if
+    None, and return {name: microseconds}.'''
+    results = {}
+    for name, bench in BENCHMARKS:
+        if keywords and not any(word in name for word in keywords):
+            continue
+        results[name] = bench()
+        if verbose:
+            print("{0:<28} {1:10.3f} us".format(name, results[name]))
+    return results
+
+def save(results, path):
+    '''Write results in the json file path, with the versions of python
+    and of the platform.'''
+    data = {"python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "results": results}
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+def compare(results, path, threshold=0.2):
+    '''Compare results with the baseline saved in path, print a table,
+    and return the list of the names slower than the baseline by more than
+    threshold.'''
+    with open(path) as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    print("\n{0:<28} {1:>10} {2:>10} {3:>8}".format("benchmark", "us",
+                                                    "baseline", "ratio"))
+    for name, duration in sorted(results.items()):
+        if name not in baseline:
+            print("{0:<28} {1:10.3f} {2:>10}".format(name, duration, "-"))
+            continue
+        ratio = duration / baseline[name]
+        slower = ratio > 1 + threshold
+        if slower:
+            regressions.append(name)
+        print("{0:<28} {1:10.3f} {2:10.3f} {3:8.2f}{4}".format(name, duration,
+                        baseline[name], ratio, "  SLOWER" if slower else ""))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="blenderOSC benchmarks")
+    parser.add_argument("-k", dest="keywords", action="append",
+                        help="run only benchmarks whose name contains this")
+    parser.add_argument("--save", metavar="FILE",
+                        help="save the results in this json file")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare with the baseline in this json file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown, default 0.2 = 20 %%")
+    args = parser.parse_args(argv)
+
+    results = run(args.keywords)
+    if args.save:
+        save(results, args.save)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print("\nSlower than baseline: {0}".format(", ".join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -29,16 +29,15 @@ This script run at all frame.
 import random
 from bge import logic as gl
 
-# Listen every frame
-gl.data = gl.my_receiver.get_data()
+# Listen every frame, read all received messages: {address: last message}
+gl.data = gl.my_receiver.get_latest()
 
 # Get x, y in data OSC message
-if gl.data:
-    if "/pos-X" in gl.data:
-        gl.x = gl.data[2]
-    if "/pos-Y" in gl.data:
-        gl.y = gl.data[2]
-# if not gl.data, gl.x and gl.y don't change, the cube is already at the same place
+if "/pos-X" in gl.data:
+    gl.x = gl.data["/pos-X"][2]
+if "/pos-Y" in gl.data:
+    gl.y = gl.data["/pos-Y"][2]
+# if nothing received, gl.x and gl.y don't change, the cube is already at the same place
 
 # Move the Cube
 controller = gl.getCurrentController()
@@ -47,4 +46,4 @@ owner.localPosition = [0.3*gl.x, 0.3*gl.y, 0]
 
 # Send
 res = 30*random.random() - 15  # from 15 to 15
-gl.my_sender.simple_send_to("/blender/x", res, (gl.ip_out, gl.port_out))
+gl.my_sender.send_to(gl.x_template.pack(res), (gl.ip_out, gl.port_out))
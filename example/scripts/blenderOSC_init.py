@@ -27,6 +27,7 @@ from bge import logic as gl
 
 '''send_receive.py is in scripts directory'''
 from scripts.send_receive import Receive, Send
+from scripts.OSCcodec import MessageTemplate
 
 
 '''
@@ -40,12 +41,16 @@ gl.ip_out = "127.0.0.1"
 gl.port_in = 9000
 gl.port_out = 8000
 gl.buffer_size = 1024
+gl.rcvbuf_size = 65536
 
 # Default position
 gl.x, gl.y = 0, 0
 
 # Listener python object
-gl.my_receiver = Receive(gl.ip_in, gl.port_in, gl.buffer_size, verbose=True)
+gl.my_receiver = Receive(gl.ip_in, gl.port_in, gl.buffer_size, verbose=True,
+                         rcvbuf_size=gl.rcvbuf_size)
 
 # Sender python object
 gl.my_sender = Send(verbose=True)
+# /blender/x is sended at every frame with a float
+gl.x_template = MessageTemplate("/blender/x", "f")
@@ -0,0 +1,217 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+## bulk_send.py
+
+#############################################################################
+# Copyright (C) Labomedia July 2014
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franproplin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+#############################################################################
+
+
+'''
+Send many UDP datagrams with the fewest system calls.
+
+send_many(sock, pairs) sends a list of (payload, address) pairs:
+    - on 64 bits Linux, with sendmmsg() called with ctypes: one system call
+      for up to SENDMMSG_MAX datagrams. All payloads are joined in one
+      buffer, pointed by the iovec array.
+    - else with socket.sendmsg() or socket.sendto(), one call per datagram.
+
+A payload is bytes, or a list of bytes sended as one datagram: sendmsg()
+sends the list without joining it (scatter-gather).
+Addresses are (ip, port) tuples, IPv4 only.
+'''
+
+
+import array
+import ctypes
+import ctypes.util
+import errno
+import itertools
+import os
+import socket
+import sys
+
+
+# Max number of messages given to one sendmmsg() call, UIO_MAXIOV on Linux
+SENDMMSG_MAX = 1024
+
+
+class _iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p),
+                ("iov_len", ctypes.c_size_t)]
+
+class _sockaddr_in(ctypes.Structure):
+    _fields_ = [("sin_family", ctypes.c_ushort),
+                ("sin_port", ctypes.c_uint16),
+                ("sin_addr", ctypes.c_ubyte * 4),
+                ("sin_zero", ctypes.c_ubyte * 8)]
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p),
+                ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_iovec)),
+                ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p),
+                ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _msghdr),
+                ("msg_len", ctypes.c_uint)]
+
+
+def _load_sendmmsg():
+    '''Return libc sendmmsg() function, or None if not available.
+    mmsghdr and iovec are filled as arrays of 64 bits words, as laid out
+    on 64 bits Linux: other systems use the loop.
+    '''
+    if not sys.platform.startswith("linux"):
+        return None
+    layout = (ctypes.sizeof(_mmsghdr), ctypes.sizeof(_iovec),
+              _msghdr.msg_name.offset, _msghdr.msg_namelen.offset,
+              _msghdr.msg_iov.offset, _msghdr.msg_iovlen.offset)
+    if layout != (64, 16, 0, 8, 16, 24):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint,
+                         ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+_sendmmsg = _load_sendmmsg()
+HAVE_SENDMMSG = _sendmmsg is not None
+
+# Words in a mmsghdr and in an iovec
+_MMSGHDR_WORDS = 8
+_IOVEC_WORDS = 2
+
+# msg_namelen word, a 32 bits integer followed by padding
+_NAMELEN = ctypes.sizeof(_sockaddr_in)
+if sys.byteorder == "big":
+    _NAMELEN <<= 32
+
+# {(ip, port): _sockaddr_in}
+_sockaddrs = {}
+# {(ip, port): address of its _sockaddr_in}
+_names = {}
+
+
+def _sockaddr(address):
+    '''Return the cached sockaddr_in of address = (ip, port).'''
+    try:
+        return _sockaddrs[address]
+    except KeyError:
+        pass
+    ip, port = address
+    packed = socket.inet_aton(socket.gethostbyname(ip))
+    sockaddr = _sockaddr_in(socket.AF_INET, socket.htons(port),
+                            (ctypes.c_ubyte * 4)(*packed))
+    _sockaddrs[address] = sockaddr
+    _names[address] = ctypes.addressof(sockaddr)
+    return sockaddr
+
+def _chunks(payload):
+    '''Return payload as a list of bytes.'''
+    if isinstance(payload, (list, tuple)):
+        return [bytes(chunk) for chunk in payload]
+    return [bytes(payload)]
+
+def send_many(sock, pairs):
+    '''Send each (payload, address) of pairs with sock, an UDP socket.
+    Return the number of datagrams sended.
+    '''
+    if not pairs:
+        return 0
+    if _sendmmsg is not None and sock.family == socket.AF_INET:
+        return _send_mmsg(sock, pairs)
+    return _send_loop(sock, pairs)
+
+def _send_loop(sock, pairs):
+    '''Send pairs one by one, with sendmsg() if available.'''
+    sendmsg = getattr(sock, "sendmsg", None)
+    for payload, address in pairs:
+        if sendmsg is not None:
+            sendmsg(_chunks(payload), [], 0, address)
+        elif isinstance(payload, (list, tuple)):
+            sock.sendto(b"".join(payload), address)
+        else:
+            sock.sendto(payload, address)
+    return len(pairs)
+
+def _send_mmsg(sock, pairs):
+    '''Send pairs with as few sendmmsg() calls as possible.'''
+    sent = 0
+    for start in range(0, len(pairs), SENDMMSG_MAX):
+        sent += _send_mmsg_block(sock, pairs[start:start + SENDMMSG_MAX])
+    return sent
+
+def _send_mmsg_block(sock, pairs):
+    '''Send at most SENDMMSG_MAX pairs.
+    Payloads are joined in one buffer, the mmsghdr and iovec arrays point
+    in it. The arrays are filled column by column, with slices.
+    '''
+    count = len(pairs)
+    payloads = [payload for payload, address in pairs]
+    try:
+        data = b"".join(payloads)
+    except TypeError:
+        # Some payloads are lists of bytes
+        payloads = [b"".join(payload) if isinstance(payload, (list, tuple))
+                    else payload for payload in payloads]
+        data = b"".join(payloads)
+    addresses = [address for payload, address in pairs]
+    try:
+        names = [_names[address] for address in addresses]
+    except KeyError:
+        names = [ctypes.addressof(_sockaddr(address))
+                 for address in addresses]
+
+    data_address = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value
+    sizes = array.array("Q", [len(payload) for payload in payloads])
+
+    iovecs = array.array("Q", [0]) * (count * _IOVEC_WORDS)
+    iovecs[0::_IOVEC_WORDS] = array.array("Q", itertools.accumulate(
+                            itertools.chain((data_address,), sizes[:-1])))
+    iovecs[1::_IOVEC_WORDS] = sizes
+
+    headers = array.array("Q", [0]) * (count * _MMSGHDR_WORDS)
+    iovecs_address = iovecs.buffer_info()[0]
+    headers[0::_MMSGHDR_WORDS] = array.array("Q", names)
+    headers[1::_MMSGHDR_WORDS] = array.array("Q", [_NAMELEN]) * count
+    headers[2::_MMSGHDR_WORDS] = array.array("Q", range(iovecs_address,
+                    iovecs_address + count * _IOVEC_WORDS * 8, _IOVEC_WORDS * 8))
+    headers[3::_MMSGHDR_WORDS] = array.array("Q", [1]) * count
+
+    fd = sock.fileno()
+    headers_address = headers.buffer_info()[0]
+    sent = 0
+    while sent < count:
+        result = _sendmmsg(fd, headers_address + sent * _MMSGHDR_WORDS * 8,
+                           count - sent, 0)
+        if result < 0:
+            code = ctypes.get_errno()
+            if code == errno.EINTR:
+                continue
+            raise OSError(code, os.strerror(code))
+        sent += result
+    return sent
@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+## dispatcher.py
+
+#############################################################################
+# Copyright (C) Labomedia July 2014
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franproplin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+#############################################################################
+
+
+'''
+Route decoded OSC messages to functions, by OSC address.
+
+Handlers are registered on OSC 1.0 address patterns:
+    ?           any single character, but '/'
+    *           any sequence of characters, '/' excepted
+    [abc]       any character in the list, ranges like [a-z] are allowed
+    [!abc]      any character not in the list
+    {foo,bar}   any of the strings
+
+Example in Blender Game Engine:
+
+    def move_x(message):
+        gl.x = message[2]
+
+    gl.dispatcher = Dispatcher()
+    gl.dispatcher.map("/pos-X", move_x)
+    gl.dispatcher.map("/light/[0-9]/*", set_light)
+    ...
+    gl.dispatcher.dispatch(gl.my_receiver.get_data())
+
+dispatch_binary() routes a received datagram without decoding it first:
+each message of a bundle is routed as soon as it is decoded.
+
+Addresses without pattern characters are found in a dict. Patterns are
+compiled to regular expressions, and the handlers found for an address are
+cached: routing an address already seen is a dict lookup.
+'''
+
+
+import re
+
+try:
+    # to run standalone
+    from OSCcodec import OSCPacketView, walkOSC
+except:
+    # to run in blender scripts directory
+    from scripts.OSCcodec import OSCPacketView, walkOSC
+
+
+# Characters making an OSC address a pattern
+PATTERN_CHARS = set("?*[]{}")
+
+
+def is_pattern(address):
+    '''Return True if address contains OSC pattern characters.'''
+    return not PATTERN_CHARS.isdisjoint(address)
+
+def compile_pattern(pattern):
+    '''Return a compiled regular expression matching the OSC addresses
+    matched by the OSC address pattern.'''
+    regex = []
+    i = 0
+    size = len(pattern)
+    while i < size:
+        char = pattern[i]
+        if char == "?":
+            regex.append("[^/]")
+        elif char == "*":
+            regex.append("[^/]*")
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end < 0:
+                raise ValueError("Unclosed '[' in {0}".format(pattern))
+            chars = pattern[i + 1:end]
+            negate = chars.startswith("!")
+            if negate:
+                chars = chars[1:]
+            # Keep '-' of ranges, escape the rest
+            chars = "-".join(re.escape(part) for part in chars.split("-"))
+            regex.append("[{0}{1}]".format("^" if negate else "", chars))
+            i = end
+        elif char == "{":
+            end = pattern.find("}", i + 1)
+            if end < 0:
+                raise ValueError("Unclosed '{{' in {0}".format(pattern))
+            strings = pattern[i + 1:end].split(",")
+            regex.append("(?:{0})".format("|".join(re.escape(string)
+                                                    for string in strings)))
+            i = end
+        else:
+            regex.append(re.escape(char))
+        i += 1
+
+    return re.compile("".join(regex) + r"\Z")
+
+
+class Dispatcher:
+    '''Call the handlers registered on OSC address patterns with the
+    received messages.'''
+
+    def __init__(self, cache_size=1024):
+        '''cache_size = integer, max number of addresses whose handlers are
+        kept in cache
+        '''
+        self.cache_size = cache_size
+        # {address: [handler, ...]}
+        self._literals = {}
+        # [(pattern, compiled regex, handler), ...]
+        self._patterns = []
+        # {address: (handler, ...)}
+        self._cache = {}
+
+    def map(self, pattern, handler):
+        '''Register handler, called with the decoded message as first
+        argument when the message address matches pattern.'''
+        if is_pattern(pattern):
+            self._patterns.append((pattern, compile_pattern(pattern), handler))
+        else:
+            self._literals.setdefault(pattern, []).append(handler)
+        self._cache.clear()
+
+    def unmap(self, pattern, handler):
+        '''Unregister handler from pattern.
+        Raises ValueError if handler isn't registered on pattern.'''
+        if is_pattern(pattern):
+            for i, (pat, regex, hand) in enumerate(self._patterns):
+                if pat == pattern and hand == handler:
+                    del self._patterns[i]
+                    break
+            else:
+                raise ValueError("{0} not mapped on {1}".format(handler,
+                                                                pattern))
+        else:
+            self._literals.get(pattern, []).remove(handler)
+            if not self._literals.get(pattern, True):
+                del self._literals[pattern]
+        self._cache.clear()
+
+    def handlers(self, address):
+        '''Return the tuple of handlers matching address.'''
+        try:
+            return self._cache[address]
+        except KeyError:
+            pass
+
+        handlers = list(self._literals.get(address, ()))
+        for pattern, regex, handler in self._patterns:
+            if regex.match(address):
+                handlers.append(handler)
+        handlers = tuple(handlers)
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[address] = handlers
+        return handlers
+
+    def dispatch(self, data, *args):
+        '''Call the handlers matching the address of data, a message or a
+        bundle decoded by decodeOSC(), with (message, *args).
+        Messages in bundles are dispatched one by one. With
+        decodeOSC(lazy=True) or Receive(lazy=True), handlers get
+        OSCPacketView messages.
+        Return the number of handlers called.
+        '''
+        if not data or not isinstance(data, (list, OSCPacketView)):
+            return 0
+
+        if data[0] == "#bundle":
+            called = 0
+            for element in data[2:]:
+                called += self.dispatch(element, *args)
+            return called
+
+        handlers = self.handlers(data[0])
+        for handler in handlers:
+            handler(data, *args)
+        return len(handlers)
+
+    def dispatch_binary(self, raw_data, *args, **limits):
+        '''Decode the binary OSC packet raw_data message by message with
+        walkOSC(), and call the handlers of each message before decoding
+        the next one.
+        limits are maxDepth, maxElements and maxSize of walkOSC().
+        Return the number of handlers called.
+        '''
+        called = 0
+        for message in walkOSC(raw_data, **limits):
+            handlers = self.handlers(message[0])
+            for handler in handlers:
+                handler(message, *args)
+            called += len(handlers)
+        return called
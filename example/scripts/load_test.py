@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+## load_test.py
+
+#############################################################################
+# Copyright (C) Labomedia July 2014
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franproplin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+#############################################################################
+
+
+'''
+Load test of Send.simple_send_to() to Receive.get_data() or
+Receive.drain() on 127.0.0.1.
+
+A thread sends OSC messages at a given rate, each one with a sequence
+number and its send time. The main loop reads them as the Blender Game
+Engine would, polling Receive at every frame, and measures:
+    - messages per second sended and received
+    - lost, reordered and duplicated messages
+    - latency from send to decoding, with p50, p99, p999 and an histogram
+
+Examples, 2000 messages per second during 5 seconds, read at 60 frames per
+second with drain(), or with get_data(), which reads one datagram per frame:
+    python3 load_test.py --rate 2000 --duration 5 --fps 60 --poll drain
+    python3 load_test.py --rate 2000 --duration 5 --fps 60 --poll get_data
+
+Compare buffer sizes and shapes:
+    python3 load_test.py --rcvbuf-size 8192 --shape wide
+'''
+
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+
+from OSCcodec import OSCMessage, OSCBundle, flattenOSC
+from send_receive import Receive, Send
+
+
+ADDRESS = "/load"
+
+# Messages sended, after the sequence number and the send time
+SHAPES = {
+    "single": lambda: [1.5],
+    "wide": lambda: [0.5 * i for i in range(64)],
+    "strings": lambda: ["name number {0}".format(i) for i in range(8)],
+    "bundle": lambda: [1.5],
+}
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def _sender(address, rate, duration, shape, bundle_size, stats):
+    '''Thread sending messages at rate per second, 0 as fast as possible.
+    In "bundle" shape, messages are sended by bundles of bundle_size.'''
+    sender = Send(verbose=False)
+    payload = SHAPES[shape]()
+    seq = 0
+    start = time.monotonic()
+    end = start + duration
+    while True:
+        now = time.monotonic()
+        if now >= end:
+            break
+        target = (now - start) * rate if rate else seq + 100
+        if seq >= target:
+            time.sleep(0.0005)
+            continue
+        while seq < target:
+            if shape == "bundle":
+                bundle = OSCBundle()
+                for i in range(bundle_size):
+                    bundle.append(_message(seq, payload))
+                    seq += 1
+                sender.send_to(bundle, address)
+            else:
+                sender.simple_send_to(ADDRESS,
+                            [seq, time.monotonic_ns()] + payload, address)
+                seq += 1
+    stats["sended"] = seq
+    stats["send_duration"] = time.monotonic() - start
+    sender.sock.close()
+
+def _message(seq, payload):
+    '''Message of a bundle: the send time is an int64, 'h' typetag.'''
+    msg = OSCMessage(ADDRESS)
+    msg.append(seq, 'i')
+    msg.append(time.monotonic_ns(), 'h')
+    msg.append(payload)
+    return msg
+
+
+def run(rate=1000, duration=3.0, shape="single", fps=60, poll="drain",
+        buffer_size=4096, rcvbuf_size=65536, bundle_size=10):
+    '''Run a load test, return a dict of results.
+    fps = frames per second of the polling loop, 0 to poll without pause
+    poll = "drain" reads all waiting datagrams at each frame, "get_data"
+           only one
+    '''
+    receiver = Receive("127.0.0.1", 0, buffer_size, rcvbuf_size=rcvbuf_size)
+    address = receiver.sock.getsockname()
+    stats = {}
+    thread = threading.Thread(target=_sender, args=(address, rate, duration,
+                                            shape, bundle_size, stats))
+
+    latencies = []
+    received = 0
+    reordered = 0
+    duplicated = 0
+    highest = -1
+    seen = set()
+    frame = 1.0 / fps if fps else 0
+    thread.start()
+    start = time.monotonic()
+    # Read until the sender is finished, and during 2 more frames
+    stop = None
+    while stop is None or time.monotonic() < stop:
+        if stop is None and not thread.is_alive():
+            stop = time.monotonic() + max(2 * frame, 0.05)
+        frame_start = time.monotonic()
+        if poll == "drain":
+            packets = receiver.drain()
+        else:
+            previous = receiver.data
+            data = receiver.get_data()
+            packets = [data] if data is not previous else []
+        now = time.monotonic_ns()
+        for packet in packets:
+            for message in flattenOSC(packet):
+                if message[0] != ADDRESS:
+                    continue
+                seq, sended = message[2], message[3]
+                if seq in seen:
+                    duplicated += 1
+                    continue
+                seen.add(seq)
+                received += 1
+                if seq < highest:
+                    reordered += 1
+                highest = max(highest, seq)
+                latencies.append((now - sended) / 1000)
+        if frame:
+            delay = frame - (time.monotonic() - frame_start)
+            if delay > 0:
+                time.sleep(delay)
+    thread.join()
+    receiver.sock.close()
+
+    sended = stats["sended"]
+    results = {
+        "shape": shape, "rate": rate, "fps": fps, "poll": poll,
+        "buffer_size": buffer_size, "rcvbuf_size": rcvbuf_size,
+        "sended": sended,
+        "received": received,
+        "lost": sended - received,
+        "loss_percent": 100.0 * (sended - received) / sended if sended else 0,
+        "reordered": reordered,
+        "duplicated": duplicated,
+        "sended_per_second": sended / stats["send_duration"],
+        "received_per_second": received / (time.monotonic() - start),
+    }
+    results["latency_us"] = percentiles(latencies)
+    results["histogram"] = histogram(latencies)
+    return results
+
+def percentiles(values, points=PERCENTILES):
+    '''Return {"p50": value, ...} of values, and their max.'''
+    if not values:
+        return {}
+    values = sorted(values)
+    result = {}
+    for point in points:
+        index = max(int(math.ceil(point / 100.0 * len(values))) - 1, 0)
+        result["p{0:g}".format(point).replace(".", "")] = values[index]
+    result["max"] = values[-1]
+    return result
+
+def histogram(values):
+    '''Return [(upper bound in microseconds, count), ...] of values, the
+    bounds being powers of 2.'''
+    counts = {}
+    for value in values:
+        bound = 2 ** max(int(math.ceil(math.log2(max(value, 1)))), 0)
+        counts[bound] = counts.get(bound, 0) + 1
+    return sorted(counts.items())
+
+def report(results):
+    '''Print the results.'''
+    print("{shape} messages, {rate} per second, poll {poll} at {fps} fps, "
+          "buffer_size {buffer_size}, rcvbuf_size {rcvbuf_size}".format(
+                                                                **results))
+    print("sended   {0:8d}  {1:10.0f} per second".format(results["sended"],
+                                            results["sended_per_second"]))
+    print("received {0:8d}  {1:10.0f} per second".format(
+                        results["received"], results["received_per_second"]))
+    print("lost     {0:8d}  {1:10.2f} %".format(results["lost"],
+                                                results["loss_percent"]))
+    print("reordered {0:7d}  duplicated {1}".format(results["reordered"],
+                                                    results["duplicated"]))
+    if results["latency_us"]:
+        print("latency  " + "  ".join("{0} {1:.0f} us".format(name, value)
+                            for name, value in results["latency_us"].items()))
+        total = sum(count for bound, count in results["histogram"])
+        for bound, count in results["histogram"]:
+            bar = "#" * int(round(50.0 * count / total))
+            print("  <= {0:>8d} us {1:8d} {2}".format(bound, count, bar))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send/Receive load test")
+    parser.add_argument("--rate", type=float, default=1000,
+                        help="messages per second, 0 as fast as possible")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="single")
+    parser.add_argument("--bundle-size", type=int, default=10,
+                        help="messages per bundle with --shape bundle")
+    parser.add_argument("--fps", type=float, default=60,
+                        help="polling frames per second, 0 without pause")
+    parser.add_argument("--poll", choices=("drain", "get_data"),
+                        default="drain")
+    parser.add_argument("--buffer-size", type=int, default=4096)
+    parser.add_argument("--rcvbuf-size", type=int, default=65536)
+    parser.add_argument("--json", action="store_true",
+                        help="print the results in json")
+    args = parser.parse_args(argv)
+
+    results = run(args.rate, args.duration, args.shape, args.fps, args.poll,
+                  args.buffer_size, args.rcvbuf_size, args.bundle_size)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
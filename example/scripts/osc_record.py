@@ -0,0 +1,311 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+## osc_record.py
+
+#############################################################################
+# Copyright (C) Labomedia July 2014
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franproplin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+#############################################################################
+
+
+'''
+Record the OSC datagrams of a session in a log file, and replay them.
+
+Record in terminal, until Ctrl+C or during 60 seconds:
+    python3 osc_record.py record show.osclog --port 9000 --duration 60
+
+or in Blender, all datagrams read by a Receive or a Client:
+    gl.my_receiver.recorder = Recorder("show.osclog")
+
+Replay to the Blender port, at the recorded speed, twice faster, or as
+fast as possible:
+    python3 osc_record.py play show.osclog --to 127.0.0.1:9000
+    python3 osc_record.py play show.osclog --to 127.0.0.1:9000 --speed 2
+    python3 osc_record.py play show.osclog --to 127.0.0.1:9000 --speed 0
+
+Log format: the 8 bytes MAGIC, then for each datagram
+    int64   nanoseconds since the start of the record, monotonic clock
+    uint32  size of the datagram
+    bytes   the datagram
+The log is only appended to while recording. LogReader maps it in memory
+with mmap: opening a long log reads only the record headers, and seeking at
+a time is a binary search.
+'''
+
+
+import argparse
+import array
+import bisect
+import mmap
+import socket
+import struct
+import sys
+import time
+
+try:
+    # to run standalone
+    from send_receive import Send
+except:
+    # to run in blender scripts directory
+    from scripts.send_receive import Send
+
+
+MAGIC = b"OSCLOG01"
+
+# Record header: timestamp in nanoseconds, size
+_Header = struct.Struct(">qI")
+
+
+class Recorder:
+    '''Append datagrams to a log file, with their time of arrival.'''
+
+    def __init__(self, path, verbose=False):
+        '''Create the log file path, erased if it exists.
+        verbose = True is very verbose in terminal
+        '''
+        self.path = path
+        self.verb = verbose
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.start = time.monotonic_ns()
+        self.count = 0
+        self.size = len(MAGIC)
+
+    def write(self, raw_data, timestamp=None):
+        '''Append raw_data, bytes or memoryview, received at timestamp,
+        time.monotonic_ns(), default now.'''
+        if timestamp is None:
+            timestamp = time.monotonic_ns()
+        self.file.write(_Header.pack(timestamp - self.start, len(raw_data)))
+        self.file.write(raw_data)
+        self.count += 1
+        self.size += _Header.size + len(raw_data)
+
+    def capture(self, sock, duration=None, max_packets=None, buffer_size=65536):
+        '''Record all datagrams received by sock, an UDP socket, during
+        duration seconds or until max_packets, or Ctrl+C.
+        Return the number of datagrams recorded.
+        '''
+        buffer = bytearray(buffer_size)
+        view = memoryview(buffer)
+        sock.settimeout(0.1)
+        end = None if duration is None else time.monotonic() + duration
+        count = 0
+        try:
+            while max_packets is None or count < max_packets:
+                if end is not None and time.monotonic() >= end:
+                    break
+                try:
+                    size = sock.recv_into(buffer)
+                except socket.timeout:
+                    continue
+                self.write(view[:size])
+                count += 1
+                if self.verb:
+                    print("{0} bytes recorded".format(size))
+        except KeyboardInterrupt:
+            pass
+        return count
+
+    def close(self):
+        '''Write the buffered records and close the log file.'''
+        self.file.close()
+
+
+class LogReader:
+    '''Read a log file mapped in memory.
+
+    reader[i] is (seconds since the start of the record, datagram), the
+    datagram being a memoryview of the mapped file, read without copy.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("{0} is not an OSC log".format(path))
+        self.view = memoryview(self.map)
+        # Nanoseconds and position of the datagram of each record
+        self.times = array.array("q")
+        self.offsets = array.array("q")
+        self._index()
+
+    def _index(self):
+        '''Read the record headers. An incomplete last record, written
+        while the recorder was stopped, is ignored.'''
+        pos = len(MAGIC)
+        size = len(self.map)
+        header = _Header.size
+        while pos + header <= size:
+            timestamp, length = _Header.unpack_from(self.map, pos)
+            if pos + header + length > size:
+                break
+            self.times.append(timestamp)
+            self.offsets.append(pos + header)
+            pos += header + length
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        offset = self.offsets[i]
+        length = _Header.unpack_from(self.map, offset - _Header.size)[1]
+        return (self.times[i] / 1e9, self.view[offset:offset + length])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def duration(self):
+        '''Return the time of the last record, in seconds.'''
+        if not self.times:
+            return 0.0
+        return self.times[-1] / 1e9
+
+    def seek(self, seconds):
+        '''Return the index of the first record at or after seconds.'''
+        return bisect.bisect_left(self.times, int(seconds * 1e9))
+
+    def close(self):
+        '''Unmap and close the log file. If datagrams read before are
+        still used, the file is closed but stays mapped in memory until
+        they and the reader are freed: copy them with bytes() to keep
+        them after close().'''
+        if hasattr(self, "view"):
+            self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            # Datagrams still use the map, unmapped when all are freed
+            pass
+        finally:
+            self.file.close()
+
+
+class Player:
+    '''Replay a log file through Send.'''
+
+    def __init__(self, path, sender=None, verbose=False):
+        '''path = log file
+        sender = Send used to replay, a new one by default
+        verbose = True is very verbose in terminal
+        '''
+        self.reader = LogReader(path)
+        self.sender = sender if sender is not None else Send(verbose=False)
+        self.verb = verbose
+
+    def play(self, address, speed=1.0, start=0.0, end=None, block=1024):
+        '''Send the records from start to end seconds to address = (ip,
+        port).
+        speed = 1.0 at the recorded speed, 2.0 twice faster ..., 0 as fast
+                as possible, by send_many() of block datagrams
+        Return the number of datagrams sended.
+        '''
+        reader = self.reader
+        first = reader.seek(start)
+        last = len(reader) if end is None else reader.seek(end)
+        if speed <= 0:
+            return self._play_fast(address, first, last, block)
+
+        origin = time.monotonic() - start / speed
+        sended = 0
+        for i in range(first, last):
+            timestamp, datagram = reader[i]
+            delay = origin + timestamp / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.sender.send_to(datagram, address)
+            sended += 1
+            if self.verb:
+                print("{0:.3f} s: {1} bytes sended".format(timestamp,
+                                                           len(datagram)))
+        return sended
+
+    def _play_fast(self, address, first, last, block):
+        sended = 0
+        for begin in range(first, last, block):
+            pairs = [(self.reader[i][1], address)
+                     for i in range(begin, min(begin + block, last))]
+            sended += self.sender.send_many(pairs)
+        return sended
+
+    def close(self):
+        self.reader.close()
+
+
+def _address(text):
+    ip, port = text.rsplit(":", 1)
+    return (ip, int(port))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and replay OSC")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    record = commands.add_parser("record", help="record an UDP port")
+    record.add_argument("path")
+    record.add_argument("--ip", default="0.0.0.0")
+    record.add_argument("--port", type=int, default=9000)
+    record.add_argument("--duration", type=float, default=None,
+                        help="seconds, default until Ctrl+C")
+
+    play = commands.add_parser("play", help="replay a log")
+    play.add_argument("path")
+    play.add_argument("--to", type=_address, default=("127.0.0.1", 9000),
+                      help="ip:port, default 127.0.0.1:9000")
+    play.add_argument("--speed", type=float, default=1.0,
+                      help="2 = twice faster, 0 = as fast as possible")
+    play.add_argument("--start", type=float, default=0.0)
+    play.add_argument("--end", type=float, default=None)
+
+    info = commands.add_parser("info", help="describe a log")
+    info.add_argument("path")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        sock.bind((args.ip, args.port))
+        recorder = Recorder(args.path)
+        count = recorder.capture(sock, args.duration)
+        recorder.close()
+        print("{0} datagrams recorded in {1}".format(count, args.path))
+
+    elif args.command == "play":
+        player = Player(args.path)
+        start = time.perf_counter()
+        count = player.play(args.to, args.speed, args.start, args.end)
+        duration = time.perf_counter() - start
+        player.close()
+        print("{0} datagrams replayed in {1:.3f} s".format(count, duration))
+
+    else:
+        reader = LogReader(args.path)
+        size = len(reader.map)
+        print("{0}: {1} datagrams, {2:.3f} s, {3} bytes".format(args.path,
+                                    len(reader), reader.duration(), size))
+        reader.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
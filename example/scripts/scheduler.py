@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+## scheduler.py
+
+#############################################################################
+# Copyright (C) Labomedia July 2014
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franproplin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+#############################################################################
+
+
+'''
+Hold received OSC-bundles until the time of their timetag.
+
+An OSC-bundle with a timetag in the future must be processed at this time,
+not when it is received: a sender can send animation cues in advance, and
+network jitter is absorbed.
+
+Example in Blender Game Engine, at every frame:
+
+    for packet in gl.my_receiver.drain():
+        gl.scheduler.push(packet)
+    for message in gl.scheduler.pop_ready():
+        gl.dispatcher.dispatch(message)
+
+Bundles are kept in a heap sorted by timetag: push() and pop_ready() cost
+O(log n) per bundle, and nothing when no bundle is due.
+Messages, bundles with the timetag 0 or 1 ("immediately") and bundles
+already due bypass the heap.
+
+Timetags are compared with clock(), time.time() by default: decodeOSC()
+gives timetags in seconds since 1 Jan 1970, as time.time(). Sender and
+receiver clocks must be synchronized, with NTP for example.
+'''
+
+
+import heapq
+import itertools
+import time
+
+
+class BundleScheduler:
+    '''Release decoded OSC messages when the clock reaches the timetag of
+    their bundle.'''
+
+    def __init__(self, clock=time.time, verbose=False):
+        '''clock = function returning the current time in seconds since
+                1 Jan 1970
+        verbose = True is very verbose in terminal
+        '''
+        self.clock = clock
+        self.verb = verbose
+        # [(timetag, arrival number, bundle), ...]
+        self.heap = []
+        # Messages to return at the next pop_ready()
+        self.ready = []
+        # Arrival number, bundles with the same timetag keep their order
+        self._count = itertools.count()
+        # Number of bundles received after their timetag
+        self.late = 0
+
+    def __len__(self):
+        '''Return the number of bundles waiting for their timetag.'''
+        return len(self.heap)
+
+    def push(self, data, now=None):
+        '''Add data, decoded by decodeOSC(), or a string unicode.
+        now = current time, default is clock()
+        '''
+        if not data:
+            return
+        if not isinstance(data, list) or data[0] != "#bundle":
+            self.ready.append(data)
+            return
+
+        timetag = data[1]
+        if timetag > 0:
+            if now is None:
+                now = self.clock()
+            if timetag > now:
+                self._schedule(data, timetag, now)
+                return
+            self.late += 1
+
+        self._release(data, now)
+
+    def _schedule(self, bundle, timetag, now):
+        heapq.heappush(self.heap, (timetag, next(self._count), bundle))
+        if self.verb:
+            print("Bundle scheduled in {0:.3f} s".format(timetag - now))
+
+    def _release(self, bundle, now=None):
+        '''Add the elements of bundle to the ready list. Sub-bundles with
+        a later timetag go to the heap, the others are released now: they
+        are on time with their parent, not late.'''
+        for element in bundle[2:]:
+            if isinstance(element, list) and element and \
+                                            element[0] == "#bundle":
+                timetag = element[1]
+                if timetag > 0:
+                    if now is None:
+                        now = self.clock()
+                    if timetag > now:
+                        self._schedule(element, timetag, now)
+                        continue
+                self._release(element, now)
+            elif element:
+                self.ready.append(element)
+
+    def pop_ready(self, now=None):
+        '''Return the list of messages ready at now, default clock():
+        messages without timetag in arrival order, then the messages of
+        the bundles whose timetag is reached, in timetag order.
+        '''
+        if self.heap:
+            if now is None:
+                now = self.clock()
+            heap = self.heap
+            while heap and heap[0][0] <= now:
+                timetag, count, bundle = heapq.heappop(heap)
+                self._release(bundle, now)
+
+        ready, self.ready = self.ready, []
+        return ready
+
+    def next_time(self):
+        '''Return the timetag of the next waiting bundle, or None.'''
+        if self.heap:
+            return self.heap[0][0]
+        return None
+
+    def clear(self):
+        '''Forget all waiting bundles and messages.'''
+        self.heap = []
+        self.ready = []
@@ -54,43 +54,86 @@ Send with socket.sendto(data, address)
 
 and data = "your unicode string".encode('utf-8')
 
+Receive and Send always count packets, bytes and decoding or encoding
+time, without printing anything: get_stats() returns a snapshot of the
+counters, to see if a scene is saturated without the verbose mode.
+
 '''
 
 
+import selectors
 import socket
+import time
 
 try:
     # to run standalone
-    from OSCcodec import OSCMessage, decodeOSC
+    from OSCcodec import OSCMessage, OSCBundleDatagrams, decodeOSC, \
+                         flattenOSC
+    from bulk_send import send_many
 except:
     # to run in blender scripts directory
-    from scripts.OSCcodec import OSCMessage, decodeOSC
+    from scripts.OSCcodec import OSCMessage, OSCBundleDatagrams, \
+                                 decodeOSC, flattenOSC
+    from scripts.bulk_send import send_many
+
 
 class Receive:
     '''Receive, decode Message with a socket .'''
 
-    def __init__(self, ip, port, buffer_size=1024, verbose=False):
+    def __init__(self, ip, port, buffer_size=1024, verbose=False,
+                 rcvbuf_size=None, lazy=False):
         '''Plug an UDP socket.
         ip example: "localhost", "127.0.0.1", "10.0.0.100"
         port = integer
         buffer_size = integer, used to clear out the buffer at each reading
         verbose = True is very verbose in terminal
+        rcvbuf_size = integer, socket receive buffer size, default to
+                      buffer_size. Set it bigger with get_latest(), which
+                      empties the buffer at each reading.
+        lazy = True to get OSC messages as OSCPacketView, decoding the
+               arguments only when read: faster with long messages which
+               are often dropped, or overwritten in get_latest()
+
+        Set self.recorder to an osc_record.Recorder to write all received
+        datagrams in a log.
+        Set self.on_packet to a function(size, seconds) to be called after
+        the decoding of each datagram, with its size and decoding time.
         '''
         self.ip = ip
         self.port = port
         self.buffer_size = buffer_size
         self.verb = verbose
+        self.lazy = lazy
         self.data = None
+        self.recorder = None
+        self.on_packet = None
+        self.stats = {"packets_in": 0,
+                      "bytes_in": 0,
+                      # neither OSC nor utf-8
+                      "decode_errors": 0,
+                      # not OSC, returned as a string unicode
+                      "utf8_fallbacks": 0,
+                      # readings with no datagram waiting
+                      "empty_polls": 0,
+                      # seconds
+                      "decode_time": 0.0}
+        if rcvbuf_size is None:
+            rcvbuf_size = buffer_size
+
+        # Datagrams are received in this buffer, and decoded from a
+        # memoryview of the received size: no bytes object per datagram
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
 
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         try:
             self.sock.bind((self.ip, self.port))
-            self.sock.setblocking(0)
-            self.sock.settimeout(0.01)
+            # Never wait: recv() on an empty socket raises at once
+            self.sock.setblocking(False)
             # This option set buffer size
             # Every self.sock.recv() empty the buffer,
             # so we have always the last incomming value
-            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf_size)
             if self.verb:
                 print('Plug : IP = {} Port = {} Buffer Size = {}'.
                       format(ip, port, buffer_size))
@@ -106,11 +149,17 @@ class Receive:
         '''Get decoded received data, OSC in a list or string unicode.'''
         raw_data = None
         try:
-            # bytes, address
-            raw_data, addr = self.sock.recvfrom(self.buffer_size)
+            # size, address
+            size, addr = self.sock.recvfrom_into(self._buffer)
+            raw_data = self._view[:size]
+            self._count(size)
+            if self.recorder is not None:
+                self.recorder.write(raw_data)
             if self.verb:
                 print("Binary received from {0}:{1} : {2}".format(self.ip,
-                                                self.port, raw_data))
+                                                self.port, bytes(raw_data)))
+        except BlockingIOError:
+            self.stats["empty_polls"] += 1
         except:
             if self.verb:
                 print('Nothing from {0}:{1}'.format(self.ip, self.port))
@@ -126,29 +175,126 @@ class Receive:
         '''Get decoded received data, OSC in a list or string unicode.'''
         raw_data = None
         try:
-            raw_data = self.sock.recv(self.buffer_size)
+            size = self.sock.recv_into(self._buffer)
+            raw_data = self._view[:size]
+            self._count(size)
+            if self.recorder is not None:
+                self.recorder.write(raw_data)
             if self.verb:
                 print("Binary received from {0}:{1} : {2}".format(self.ip,
-                                                self.port, raw_data))
+                                                self.port, bytes(raw_data)))
+        except BlockingIOError:
+            # Nothing received, the most frequent case: no formatting here
+            self.stats["empty_polls"] += 1
         except:
             if self.verb:
                 print('Nothing from {0}:{1}'.format(self.ip, self.port))
         if raw_data:
             self.data = self.convert_data(raw_data)
 
+    def drain(self, max_packets=None):
+        '''Read all waiting datagrams without blocking, and return the list
+        of decoded packets, oldest first: OSC in a list or string unicode.
+        max_packets = integer, stop reading after this number of datagrams,
+                      default read until the buffer is empty
+        '''
+        packets = []
+        count = 0
+        size = 0
+        recv_into = self.sock.recv_into
+        buffer, view = self._buffer, self._view
+        while max_packets is None or count < max_packets:
+            try:
+                raw_data = view[:recv_into(buffer)]
+            except OSError:
+                break
+            count += 1
+            size += len(raw_data)
+            if self.recorder is not None:
+                self.recorder.write(raw_data)
+            if not raw_data:
+                continue
+            try:
+                data = self.convert_data(raw_data)
+            except UnicodeDecodeError:
+                if self.verb:
+                    print('Not OSC and not utf-8: {0}'.format(
+                                                            bytes(raw_data)))
+                continue
+            packets.append(data)
+
+        if count:
+            self._count(size, count)
+        else:
+            self.stats["empty_polls"] += 1
+        if packets:
+            self.data = packets[-1]
+        if self.verb and count:
+            print("{0} datagrams read from {1}:{2}".format(count, self.ip,
+                                                           self.port))
+        return packets
+
+    def get_latest(self, max_packets=None):
+        '''Read all waiting datagrams without blocking, and return a dict
+        {OSC address: last decoded message at this address}.
+        Messages in bundles are read as the others.
+        Data without OSC is under the None key.
+        max_packets = integer, stop reading after this number of datagrams,
+                      default read until the buffer is empty
+        '''
+        latest = {}
+        for data in self.drain(max_packets):
+            self._coalesce(data, latest)
+        return latest
+
+    def _count(self, size, packets=1):
+        '''Count packets received with size bytes.'''
+        stats = self.stats
+        stats["packets_in"] += packets
+        stats["bytes_in"] += size
+
+    def get_stats(self):
+        '''Return a snapshot of the counters, a dict:
+        packets_in, bytes_in, decode_errors, utf8_fallbacks, empty_polls,
+        decode_time in seconds.
+        '''
+        return dict(self.stats)
+
+    def _coalesce(self, data, latest):
+        '''Store decoded data in latest dict, under its OSC address.'''
+        if isinstance(data, str):
+            latest[None] = data
+        for message in flattenOSC(data):
+            latest[message[0]] = message
+
     def convert_data(self, raw_data):
-        '''From raw binary data, return decoded OSC data in a list,
-        or unicode string .
+        '''From raw binary data, bytes or memoryview, return decoded OSC
+        data in a list, or unicode string .
         '''
+        if self.lazy and isinstance(raw_data, memoryview):
+            # OSCPacketView keeps the data, which must not be overwritten
+            # by the next datagram received in the buffer
+            raw_data = bytes(raw_data)
         data = None
+        start = time.perf_counter()
         try:
-            data = decodeOSC(raw_data)
+            data = decodeOSC(raw_data, lazy=self.lazy)
             if self.verb:
                 print("Decoded OSC message: {0}".format(self.data))
         except:
-            data = raw_data.decode('utf-8')
+            try:
+                data = str(raw_data, 'utf-8')
+            except UnicodeDecodeError:
+                self.stats["decode_errors"] += 1
+                raise
+            self.stats["utf8_fallbacks"] += 1
             if self.verb:
-                print('No OSC message in {0}'.format(raw_data))
+                print('No OSC message in {0}'.format(bytes(raw_data)))
+        finally:
+            seconds = time.perf_counter() - start
+            self.stats["decode_time"] += seconds
+        if self.on_packet is not None:
+            self.on_packet(len(raw_data), seconds)
         return data
 
     def listen_unicode(self):
@@ -156,11 +302,18 @@ class Receive:
         Sended data must be encoded with 'utf-8'.
         Return raw data decoded with 'utf-8', or None.'''
         try:
-            raw_data = self.sock.recv(self.buffer_size)
+            size = self.sock.recv_into(self._buffer)
+            raw_data = self._view[:size]
+            self._count(size)
+            if self.recorder is not None:
+                self.recorder.write(raw_data)
             if self.verb:
                 print("Receive from {0}:{1} : {2}".format(self.ip,
-                                                self.port, raw_data))
-            self.data = raw_data.decode('utf-8')
+                                                self.port, bytes(raw_data)))
+            self.data = str(raw_data, 'utf-8')
+        except BlockingIOError:
+            self.stats["empty_polls"] += 1
+            self.data = None
         except:
             self.data = None
             if self.verb:
@@ -168,28 +321,220 @@ class Receive:
         return self.data
 
 
+class MultiReceive:
+    '''Receive on many ports, polling only the sockets with waiting
+    datagrams.
+
+    Each endpoint is a Receive, all sockets are registered in a selector,
+    epoll on Linux: at each frame, one select() without timeout gives the
+    ready sockets, idle ports cost nothing.
+    example:
+    gl.my_receiver = MultiReceive([("0.0.0.0", 8000), ("0.0.0.0", 9000)])
+    ...
+    for port, data in gl.my_receiver.drain():
+        ...
+    '''
+
+    def __init__(self, endpoints=(), buffer_size=1024, verbose=False,
+                 rcvbuf_size=None, lazy=False):
+        '''Plug an UDP socket on each endpoint = (ip, port).
+        buffer_size, verbose, rcvbuf_size, lazy: as in Receive, for all
+        endpoints
+        '''
+        self.buffer_size = buffer_size
+        self.verb = verbose
+        self.rcvbuf_size = rcvbuf_size
+        self.lazy = lazy
+        self.data = None
+        # {port: Receive}
+        self.receivers = {}
+        self.selector = selectors.DefaultSelector()
+        for ip, port in endpoints:
+            self.add_endpoint(ip, port)
+
+    def add_endpoint(self, ip, port):
+        '''Plug an UDP socket on (ip, port), port 0 for any free port.
+        Return the Receive of this endpoint.
+        '''
+        receiver = Receive(ip, port, self.buffer_size, self.verb,
+                           self.rcvbuf_size, self.lazy)
+        bound = receiver.sock.getsockname()[1]
+        if not bound:
+            # Receive doesn't raise when the port is already used
+            receiver.sock.close()
+            raise OSError("Can't receive on {0}:{1}".format(ip, port))
+        if bound in self.receivers:
+            receiver.sock.close()
+            raise ValueError("Port {0} is already received".format(bound))
+        port = bound
+        self.receivers[port] = receiver
+        self.selector.register(receiver.sock, selectors.EVENT_READ,
+                               (port, receiver))
+        return receiver
+
+    def remove_endpoint(self, port):
+        '''Unplug and close the socket of port.'''
+        receiver = self.receivers.pop(port)
+        self.selector.unregister(receiver.sock)
+        receiver.sock.close()
+
+    def drain(self, max_packets=None):
+        '''Read all waiting datagrams of the ready sockets, return the list
+        of (port, decoded packet), oldest first for each port.
+        max_packets = integer, stop reading a socket after this number of
+                      datagrams
+        '''
+        packets = []
+        for key, events in self.selector.select(0):
+            port, receiver = key.data
+            for data in receiver.drain(max_packets):
+                packets.append((port, data))
+        if packets:
+            self.data = packets[-1]
+        return packets
+
+    def get_latest(self, max_packets=None):
+        '''Read all waiting datagrams of the ready sockets, and return a
+        dict {port: {OSC address: last decoded message at this address}}.
+        Ports with nothing new are missing.
+        '''
+        latest = {}
+        for key, events in self.selector.select(0):
+            port, receiver = key.data
+            messages = receiver.get_latest(max_packets)
+            if messages:
+                latest[port] = messages
+        return latest
+
+    def get_stats(self):
+        '''Return a dict {port: snapshot of the counters of its Receive}.'''
+        return {port: receiver.get_stats()
+                for port, receiver in self.receivers.items()}
+
+    def close(self):
+        '''Close all sockets and the selector.'''
+        for port in list(self.receivers):
+            self.remove_endpoint(port)
+        self.selector.close()
+
+
 class Send:
     '''Create your OSC messge with OSCcodec,
     example:
     msg = OSCMessage("/my/osc/address")
     msg.append('something')
     See OSCcodec documentation in OSCcodec.html.
+
+    In batch mode, OSC messages are only queued by send_to() and
+    simple_send_to(), call flush() once per frame to send them, packed in
+    OSC-bundles: one sendto() per max_size bytes, instead of one per message.
+    The buffer_size of the Receive reading them must be at least max_size.
     '''
 
-    def __init__(self, verbose=True):
-        '''Create an UDP socket.'''
+    def __init__(self, verbose=True, batch=False, max_size=1024):
+        '''Create an UDP socket.
+        batch = True to queue OSC messages until flush()
+        max_size = integer, max size of a bundle sended by flush(), default
+                   is the default buffer_size of Receive. Up to 1472, the
+                   UDP payload of an Ethernet frame, if the receiver reads
+                   bigger datagrams.
+
+        Set self.on_packet to a function(size, seconds) to be called for
+        each OSC message sended or queued, with its size and encoding time.
+        '''
         self.verb = verbose
+        self.batch = batch
+        self.max_size = max_size
+        self.pending = {}
+        self.last_flush = {"messages": 0, "datagrams": 0, "bytes": 0}
+        self.on_packet = None
+        self.stats = {"packets_out": 0,
+                      "bytes_out": 0,
+                      # seconds
+                      "encode_time": 0.0}
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
+    def get_stats(self):
+        '''Return a snapshot of the counters, a dict:
+        packets_out and bytes_out, datagrams really sended,
+        encode_time in seconds.
+        '''
+        return dict(self.stats)
+
+    def _count(self, size, packets=1):
+        '''Count packets sended with size bytes.'''
+        stats = self.stats
+        stats["packets_out"] += packets
+        stats["bytes_out"] += size
+
     def send_str_to(self, string, address):
         '''Send unicode string to address = (ip, port).'''
-        self.sock.sendto(string.encode("utf-8"), address)
+        data = string.encode("utf-8")
+        self.sock.sendto(data, address)
+        self._count(len(data))
 
     def send_to(self, msg, address):
         '''Send msg to address = tuple = (ip, port)
-        msg is an OSC message create with OSCMessage().
+        msg is an OSC message create with OSCMessage(), or its binary, as
+        returned by MessageTemplate.pack(), or a memoryview of it.
+        In batch mode, msg is sended by the next flush().
+        '''
+        if isinstance(msg, (bytes, bytearray, memoryview)):
+            self._send(msg, address, 0.0)
+        else:
+            start = time.perf_counter()
+            binary = msg.getBinary()
+            self._send(binary, address, time.perf_counter() - start)
+
+    def _send(self, binary, address, seconds):
+        '''Send or queue binary, encoded in seconds, and count it.'''
+        stats = self.stats
+        stats["encode_time"] += seconds
+        if self.on_packet is not None:
+            self.on_packet(len(binary), seconds)
+        if self.batch:
+            # A template buffer is overwritten by its next pack()
+            self.pending.setdefault(address, []).append(bytes(binary))
+        else:
+            self.sock.sendto(binary, address)
+            stats["packets_out"] += 1
+            stats["bytes_out"] += len(binary)
+
+    def flush(self):
+        '''Send all queued OSC messages, packed in OSC-bundles.
+        Return and store in self.last_flush a dict with the numbers of
+        messages, datagrams and bytes sended.
         '''
-        self.sock.sendto(msg.getBinary(), address)
+        stats = {"messages": 0, "datagrams": 0, "bytes": 0}
+        pending, self.pending = self.pending, {}
+        pairs = []
+        for address, binaries in pending.items():
+            stats["messages"] += len(binaries)
+            for datagram in OSCBundleDatagrams(binaries, self.max_size):
+                pairs.append((datagram, address))
+                stats["bytes"] += len(datagram)
+        stats["datagrams"] = send_many(self.sock, pairs)
+        self._count(stats["bytes"], stats["datagrams"])
+        self.last_flush = stats
+        if self.verb and stats["messages"]:
+            print("OSC messages flushed: {0}".format(stats))
+        return stats
+
+    def send_many(self, pairs):
+        '''Send a list of (payload, address) pairs with the fewest system
+        calls: one sendmmsg() for up to 1024 datagrams on Linux.
+        payload is bytes, or a list of bytes sended as one datagram.
+        Return the number of datagrams sended.
+        '''
+        sended = send_many(self.sock, pairs)
+        size = 0
+        for payload, address in pairs[:sended]:
+            if isinstance(payload, list):
+                size += sum(map(len, payload))
+            else:
+                size += len(payload)
+        self._count(size, sended)
+        return sended
 
     def simple_send_to(self, title, value, address):
         '''Create and send OSC message:
@@ -201,12 +546,84 @@ class Send:
         example:
         simple_send_to((127.0.0.1, 8000), "/spam", 1.023)
         '''
+        # Arguments are encoded when the message is created
+        start = time.perf_counter()
         msg = OSCMessage(title, value)
-        self.send_to(msg, address)
+        binary = msg.getBinary()
+        self._send(binary, address, time.perf_counter() - start)
         if self.verb:
             print("OSC message sended: {0}".format(msg))
 
 
+class FanOutSend:
+    '''Send the same OSC messages to many destinations.
+
+    Each destination has its own connected UDP socket: the address isn't
+    given at each send, and each message is encoded only once, whatever the
+    number of destinations.
+    example:
+    sender = FanOutSend([("127.0.0.1", 8000), ("10.0.0.100", 9000)])
+    sender.simple_send("/spam", 1.023)
+    '''
+
+    def __init__(self, destinations=(), verbose=False):
+        '''Create a connected UDP socket for each destination = (ip, port).
+        verbose = True is very verbose in terminal
+        '''
+        self.verb = verbose
+        self.socks = {}
+        self._sends = []
+        for address in destinations:
+            self.add_destination(address)
+
+    def add_destination(self, address):
+        '''Add a destination address = (ip, port).'''
+        if address in self.socks:
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.connect(address)
+        self.socks[address] = sock
+        self._sends = [sock.send for sock in self.socks.values()]
+
+    def remove_destination(self, address):
+        '''Remove and close the destination address = (ip, port).'''
+        sock = self.socks.pop(address)
+        sock.close()
+        self._sends = [sock.send for sock in self.socks.values()]
+
+    def send(self, msg):
+        '''Send msg to all destinations.
+        msg is an OSC message create with OSCMessage(), or its binary, as
+        bytes, bytearray or memoryview, sended without copy.
+        '''
+        if not isinstance(msg, (bytes, bytearray, memoryview)):
+            msg = msg.getBinary()
+        for send in self._sends:
+            try:
+                send(msg)
+            except ConnectionRefusedError:
+                # A previous datagram found no one listening
+                if self.verb:
+                    print('Destination refused: {0}'.format(send.__self__))
+
+    def simple_send(self, title, value):
+        '''Create and send OSC message to all destinations:
+
+        tille: string beginning with "/
+        value: int, str, list, dict,
+                dict are conert to list
+        '''
+        msg = OSCMessage(title, value)
+        self.send(msg)
+        if self.verb:
+            print("OSC message sended: {0}".format(msg))
+
+    def close(self):
+        '''Close all sockets.'''
+        for address in list(self.socks):
+            self.remove_destination(address)
+
+
 class Client:
     '''Send and Receive with the same socket.
 
@@ -228,12 +645,18 @@ class Client:
         self.verb = verbose
         self.conn = False
         self.data = None
+        # osc_record.Recorder writing all received datagrams, or None
+        self.recorder = None
+
+        # Preallocated receive buffer
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
 
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         try:
             self.sock.bind((self.ip, self.port))
+            # Never wait: recv() on an empty socket raises at once
             self.sock.setblocking(False)
-            self.sock.settimeout(0.01)
             # This option set buffer size
             # Every self.sock.recv() empty the buffer,
             # so we have always the last incomming value
@@ -247,8 +670,10 @@ class Client:
 
     def send(self, req):
         '''Send request to connected socket.'''
-        addr = self.ip, self.port
-        self.sock.connect(addr)
+        if not self.conn:
+            addr = self.ip, self.port
+            self.sock.connect(addr)
+            self.conn = True
         self.sock.send(req)
         if self.verb:
             print('{0} sended'.format(req))
@@ -262,11 +687,23 @@ class Client:
 
     def listen(self):
         '''Return received data and address from.'''
+        raw_data, addr = self.listen_view()
+        if raw_data is not None:
+            raw_data = bytes(raw_data)
+        return raw_data, addr
+
+    def listen_view(self):
+        '''Return received data and address from, without copy: data is a
+        memoryview of the receive buffer, valid until the next listen.'''
         raw_data, addr = None, None
         try:
-            raw_data, addr = self.sock.recvfrom(self.buffer_size)
+            size, addr = self.sock.recvfrom_into(self._buffer)
+            raw_data = self._view[:size]
+            if self.recorder is not None:
+                self.recorder.write(raw_data)
             if self.verb:
-                print("Binary received from {0}: {1}".format(addr, raw_data))
+                print("Binary received from {0}: {1}".format(addr,
+                                                        bytes(raw_data)))
         except:
             if self.verb:
                 print('Received nothing')
@@ -0,0 +1,359 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+## tcp_osc.py
+
+#############################################################################
+# Copyright (C) Labomedia July 2014
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franproplin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+#############################################################################
+
+
+'''
+OSC over TCP: TCPSend and TCPReceive, as Send and Receive in
+send_receive.py, on a reliable stream, without the size limit of a
+datagram.
+
+A stream has no datagram boundaries, the OSC packets are framed:
+    - framing="length": OSC 1.0, each packet is prefixed by its size, an
+      int32
+    - framing="slip": OSC 1.1, each packet is SLIP encoded (RFC 1055) and
+      framed by END bytes, as sent by Pure Data [packOSCstream] or TouchOSC
+
+FrameParser cuts the received stream in packets. Received bytes are
+appended to a bytearray, and the bytes already parsed are never read again.
+
+TCPReceive never waits, it can be used in the Blender Game Engine:
+    gl.my_receiver = TCPReceive("127.0.0.1", 9000)
+    ...
+    gl.data = gl.my_receiver.get_latest()
+
+TCPSend in batch mode joins the messages of a frame in one sendall().
+'''
+
+
+import socket
+import struct
+
+try:
+    # to run standalone
+    from OSCcodec import OSCMessage, OSCError, decodeOSC, flattenOSC
+except:
+    # to run in blender scripts directory
+    from scripts.OSCcodec import OSCMessage, OSCError, decodeOSC, flattenOSC
+
+
+# SLIP special bytes
+END = b"\xc0"
+ESC = b"\xdb"
+ESC_END = b"\xdc"
+ESC_ESC = b"\xdd"
+
+FRAMINGS = ("length", "slip")
+
+_Size = struct.Struct(">i")
+
+
+def slip_encode(binary):
+    '''Return binary SLIP encoded, between two END bytes.'''
+    return END + binary.replace(ESC, ESC + ESC_ESC).replace(END,
+                                                    ESC + ESC_END) + END
+
+def slip_decode(frame):
+    '''Return the packet of a SLIP frame, without its END bytes.'''
+    return frame.replace(ESC + ESC_END, END).replace(ESC + ESC_ESC, ESC)
+
+def length_encode(binary):
+    '''Return binary prefixed by its size, an int32.'''
+    return _Size.pack(len(binary)) + binary
+
+def frame(binary, framing="slip"):
+    '''Return the binary OSC packet framed for a stream.'''
+    if framing == "slip":
+        return slip_encode(binary)
+    return length_encode(binary)
+
+
+class FrameParser:
+    '''Cut a stream in OSC packets.
+
+    feed() appends the received bytes to a bytearray and returns the
+    complete packets. The bytes of the returned packets are deleted from
+    the start of the bytearray, which doesn't move the rest in CPython.
+    In SLIP, the search of the next END starts where the previous one
+    stopped.
+    '''
+
+    def __init__(self, framing="slip", max_size=1 << 20):
+        '''framing = "slip" or "length"
+        max_size = integer, max size of a packet. A bigger one is a framing
+                   error: OSCError is raised.
+        '''
+        if framing not in FRAMINGS:
+            raise ValueError("framing must be one of {0}".format(FRAMINGS))
+        self.framing = framing
+        self.max_size = max_size
+        self.buffer = bytearray()
+        # Position where the search of the next SLIP END starts
+        self._scan = 0
+
+    def __len__(self):
+        '''Return the number of bytes waiting for the end of their
+        packet.'''
+        return len(self.buffer)
+
+    def feed(self, data):
+        '''Append data, bytes or memoryview, to the stream, return the list
+        of packets completed.'''
+        self.buffer += data
+        if self.framing == "slip":
+            return self._parse_slip()
+        return self._parse_length()
+
+    def _parse_length(self):
+        buf = self.buffer
+        size = len(buf)
+        start = 0
+        packets = []
+        while size - start >= 4:
+            length = _Size.unpack_from(buf, start)[0]
+            if length < 0 or length > self.max_size:
+                raise OSCError("Packet size {0} out of 0 to {1}".format(
+                                                    length, self.max_size))
+            if size - start - 4 < length:
+                break
+            packets.append(bytes(buf[start + 4:start + 4 + length]))
+            start += 4 + length
+        if start:
+            del buf[:start]
+        return packets
+
+    def _parse_slip(self):
+        buf = self.buffer
+        start = 0
+        packets = []
+        while True:
+            end = buf.find(END, self._scan)
+            if end < 0:
+                self._scan = len(buf)
+                break
+            if end > start:
+                packets.append(slip_decode(bytes(buf[start:end])))
+            start = end + 1
+            self._scan = start
+        if start:
+            del buf[:start]
+            self._scan -= start
+        if len(buf) > 2 * self.max_size + 2:
+            # even fully escaped, a valid packet would be smaller
+            raise OSCError("No SLIP END in {0} bytes".format(len(buf)))
+        return packets
+
+    def clear(self):
+        '''Forget the bytes of an incomplete packet.'''
+        self.buffer = bytearray()
+        self._scan = 0
+
+
+class TCPSend:
+    '''Send OSC messages on a TCP connection.
+
+    example:
+    sender = TCPSend("127.0.0.1", 8000)
+    sender.simple_send("/spam", 1.023)
+
+    In batch mode, messages are only queued by send() and simple_send(),
+    call flush() once per frame to send them with one sendall().
+    '''
+
+    def __init__(self, ip, port, framing="slip", batch=False, verbose=False):
+        '''Connect a TCP socket to (ip, port).
+        framing = "slip" or "length"
+        batch = True to queue OSC messages until flush()
+        verbose = True is very verbose in terminal
+        '''
+        if framing not in FRAMINGS:
+            raise ValueError("framing must be one of {0}".format(FRAMINGS))
+        self.ip = ip
+        self.port = port
+        self.framing = framing
+        self.batch = batch
+        self.verb = verbose
+        self.pending = []
+        self.sock = socket.create_connection((ip, port))
+        # Small messages are sended at once, batch mode groups them
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def send(self, msg):
+        '''Send msg, an OSC message create with OSCMessage() or
+        OSCBundle(), or its binary.
+        In batch mode, msg is sended by the next flush().
+        '''
+        if not isinstance(msg, (bytes, bytearray)):
+            msg = msg.getBinary()
+        framed = frame(bytes(msg), self.framing)
+        if self.batch:
+            self.pending.append(framed)
+        else:
+            self.sock.sendall(framed)
+
+    def simple_send(self, title, value):
+        '''Create and send OSC message:
+
+        tille: string beginning with "/
+        value: int, str, list, dict,
+                dict are conert to list
+        '''
+        msg = OSCMessage(title, value)
+        self.send(msg)
+        if self.verb:
+            print("OSC message sended: {0}".format(msg))
+
+    def flush(self):
+        '''Send all queued messages with one sendall(), return the number
+        of bytes sended.'''
+        if not self.pending:
+            return 0
+        data = b"".join(self.pending)
+        self.pending = []
+        self.sock.sendall(data)
+        if self.verb:
+            print("{0} bytes sended to {1}:{2}".format(len(data), self.ip,
+                                                       self.port))
+        return len(data)
+
+    def close(self):
+        '''Send queued messages and close the connection.'''
+        self.flush()
+        self.sock.close()
+
+
+class TCPReceive:
+    '''Accept TCP connections, receive and decode OSC messages, without
+    ever waiting.'''
+
+    def __init__(self, ip, port, framing="slip", buffer_size=65536,
+                 max_size=1 << 20, verbose=False):
+        '''Listen on (ip, port).
+        ip example: "localhost", "127.0.0.1", "10.0.0.100"
+        port = integer
+        framing = "slip" or "length"
+        buffer_size = integer, size of each recv
+        max_size = integer, max size of a packet, a client sending a bigger
+                   one is disconnected
+        verbose = True is very verbose in terminal
+        '''
+        if framing not in FRAMINGS:
+            raise ValueError("framing must be one of {0}".format(FRAMINGS))
+        self.ip = ip
+        self.port = port
+        self.framing = framing
+        self.max_size = max_size
+        self.verb = verbose
+        self.data = None
+        self.errors = 0
+        # {socket: FrameParser}
+        self.clients = {}
+
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((ip, port))
+        self.sock.listen(8)
+        self.sock.setblocking(False)
+        if self.verb:
+            print('Listen : IP = {} Port = {}'.format(ip, port))
+
+    def _accept(self):
+        '''Accept the waiting connections.'''
+        while True:
+            try:
+                client, addr = self.sock.accept()
+            except OSError:
+                return
+            client.setblocking(False)
+            self.clients[client] = FrameParser(self.framing, self.max_size)
+            if self.verb:
+                print('Connection from {0}'.format(addr))
+
+    def _disconnect(self, client):
+        del self.clients[client]
+        client.close()
+
+    def drain(self):
+        '''Read all waiting bytes of all connections, return the list of
+        decoded packets, OSC in a list, oldest first.'''
+        self._accept()
+        packets = []
+        for client, parser in list(self.clients.items()):
+            while True:
+                try:
+                    size = client.recv_into(self._buffer)
+                except BlockingIOError:
+                    break
+                except OSError:
+                    size = 0
+                if not size:
+                    self._disconnect(client)
+                    break
+                try:
+                    frames = parser.feed(self._view[:size])
+                except OSCError as e:
+                    self.errors += 1
+                    if self.verb:
+                        print('Framing error, disconnected: {0}'.format(e))
+                    self._disconnect(client)
+                    break
+                for binary in frames:
+                    try:
+                        packets.append(decodeOSC(binary))
+                    except Exception:
+                        self.errors += 1
+                        if self.verb:
+                            print('No OSC message in {0}'.format(binary))
+        if packets:
+            self.data = packets[-1]
+        return packets
+
+    def get_data(self):
+        '''Return the last decoded packet, or the previous one if nothing
+        new.'''
+        self.drain()
+        return self.data
+
+    def get_latest(self):
+        '''Read all waiting bytes, and return a dict
+        {OSC address: last decoded message at this address}.
+        Messages in bundles are read as the others.
+        '''
+        latest = {}
+        for data in self.drain():
+            self._coalesce(data, latest)
+        return latest
+
+    def _coalesce(self, data, latest):
+        '''Store decoded data in latest dict, under its OSC address.'''
+        for message in flattenOSC(data):
+            latest[message[0]] = message
+
+    def close(self):
+        '''Close all connections and the listening socket.'''
+        for client in list(self.clients):
+            self._disconnect(client)
+        self.sock.close()
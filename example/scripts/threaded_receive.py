@@ -0,0 +1,185 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+## threaded_receive.py
+
+#############################################################################
+# Copyright (C) Labomedia July 2014
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franproplin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+#############################################################################
+
+
+'''
+Not to be used in the Blender 3D Game Engine, which doesn't accept thread:
+use Receive in send_receive.py there.
+
+ThreadedReceive receive and decode OSC message in a thread, for python
+scripts running outside Blender.
+
+The thread receives in a preallocated buffer, decodes, and publishes:
+    - in a ring buffer of the last decoded packets, read with drain()
+    - in a table of the last message at each OSC address, read with
+      get_latest()
+Main loop never waits for the socket.
+
+The ring buffer is a collections.deque with a maxlen: append() and popleft()
+are atomic, no lock is needed between the thread and the main loop.
+When the main loop reads too slowly, the oldest packets are lost.
+'''
+
+
+import collections
+import socket
+import threading
+
+try:
+    # to run standalone
+    from OSCcodec import decodeOSC, flattenOSC
+except:
+    # to run in blender scripts directory
+    from scripts.OSCcodec import decodeOSC, flattenOSC
+
+
+class ThreadedReceive:
+    '''Receive, decode Message with a socket, in a thread.'''
+
+    def __init__(self, ip, port, buffer_size=1024, ring_size=256,
+                 verbose=False, rcvbuf_size=65536):
+        '''Plug an UDP socket, start() must be called to receive.
+        ip example: "localhost", "127.0.0.1", "10.0.0.100"
+        port = integer
+        buffer_size = integer, max size of a received datagram
+        ring_size = integer, number of decoded packets kept for drain()
+        verbose = True is very verbose in terminal
+        rcvbuf_size = integer, socket receive buffer size
+        '''
+        self.ip = ip
+        self.port = port
+        self.buffer_size = buffer_size
+        self.verb = verbose
+        self.data = None
+
+        self.ring = collections.deque(maxlen=ring_size)
+        self.latest = {}
+        self.errors = 0
+
+        # Preallocated buffer, only used by the thread
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf_size)
+        self.sock.bind((self.ip, self.port))
+        # The thread wakes up periodically to see if it must stop
+        self.sock.settimeout(0.1)
+        if self.verb:
+            print('Plug : IP = {} Port = {} Buffer Size = {}'.
+                  format(ip, port, buffer_size))
+
+    def start(self):
+        '''Start the receiving thread.'''
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run,
+                                            name="ThreadedReceive",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        '''Stop the receiving thread, wait until it is stopped.'''
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        '''Stop the thread and close the socket.'''
+        self.stop()
+        self.sock.close()
+
+    def _run(self):
+        '''Thread loop: receive, decode, publish.'''
+        while not self._stop.is_set():
+            try:
+                size, addr = self.sock.recvfrom_into(self._buffer)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self.verb:
+                    print('Nothing from {0}:{1}'.format(self.ip, self.port))
+                continue
+
+            if size:
+                self._publish(self._view[:size])
+
+    def _publish(self, raw_data):
+        '''Decode raw_data, a memoryview of the buffer, and publish it.'''
+        try:
+            data = decodeOSC(raw_data)
+        except Exception:
+            try:
+                data = str(raw_data, 'utf-8')
+            except UnicodeDecodeError:
+                self.errors += 1
+                if self.verb:
+                    print('Not OSC and not utf-8: {0}'.format(bytes(raw_data)))
+                return
+        if not data:
+            return
+        if self.verb:
+            print("Decoded OSC message: {0}".format(data))
+
+        self.ring.append(data)
+        self._coalesce(data)
+
+    def _coalesce(self, data):
+        '''Store decoded data in the latest table, under its OSC address.'''
+        if isinstance(data, str):
+            self.latest[None] = data
+        for message in flattenOSC(data):
+            self.latest[message[0]] = message
+
+    def get_data(self):
+        '''Return the last decoded packet, OSC in a list or string unicode,
+        or the previous one if nothing new.'''
+        try:
+            self.data = self.ring[-1]
+        except IndexError:
+            pass
+        return self.data
+
+    def drain(self):
+        '''Return the list of decoded packets received since the previous
+        drain(), oldest first, and empty the ring buffer.'''
+        packets = []
+        try:
+            while True:
+                packets.append(self.ring.popleft())
+        except IndexError:
+            pass
+        if packets:
+            self.data = packets[-1]
+        return packets
+
+    def get_latest(self):
+        '''Return a dict {OSC address: last message received at this
+        address} since the thread start. Data without OSC is under the
+        None key.'''
+        return dict(self.latest)